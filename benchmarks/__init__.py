@@ -0,0 +1 @@
+"""Benchmarks of the primitive_db core operations."""
@@ -0,0 +1,453 @@
+"""Benchmark runner for the core database operations.
+
+Synthetic tables are generated from a fixed seed for every schema and size,
+each operation is timed several times and the results are written as JSON:
+
+    python -m benchmarks.run --sizes 1000 100000 --output bench.json
+    python -m benchmarks.run --compare bench.json --threshold 1.2
+
+With --compare the new timings are checked against an earlier result file
+and the run fails if any benchmark got slower than the threshold allows.
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from src.primitive_db import core, index, parser
+from src.primitive_db.decorators import set_auto_confirm
+from src.primitive_db.engine import _print_table
+from src.primitive_db.utils import TableData, load_table_data, save_table_data
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SCHEMAS = {
+    "narrow": {"ID": "int", "name": "str", "age": "int", "active": "bool"},
+    "wide": {
+        "ID": "int",
+        "name": "str",
+        "email": "str",
+        "city": "str",
+        "age": "int",
+        "score": "int",
+        "balance": "int",
+        "visits": "int",
+        "active": "bool",
+        "verified": "bool",
+    },
+}
+DEFAULT_SIZES = (1_000, 100_000)
+SEED = 42
+# Rendering and inserting row by row are measured on a bounded number of
+# rows so that large sizes stay practical.
+RENDER_ROWS = 5_000
+INSERT_ROWS = 1_000
+# Table size for the one-shot startup benchmarks.
+STARTUP_ROWS = 1_000
+# Number of commands parsed per parse_statement benchmark run.
+PARSE_STATEMENTS = 1_000
+WHERE_CLAUSE = 'age > 30 and (name = "user7" or active = true) and not score < 10'
+
+
+def main() -> None:
+    """Run the benchmarks and write or compare the results."""
+    args = _parse_args()
+    set_auto_confirm(True)
+
+    results = []
+    for schema in args.schemas:
+        for rows in args.sizes:
+            results.extend(run_table_benchmarks(schema, rows, args.repeat))
+    if not args.skip_script:
+        for rows in args.sizes:
+            results.append(run_script_benchmark(rows, args.repeat))
+        results.extend(run_startup_benchmarks(args.repeat))
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if not compare(baseline["results"], results, args.threshold):
+            sys.exit(1)
+
+
+def run_table_benchmarks(schema: str, rows: int, repeat: int) -> list:
+    """Time the in-process operations on one synthetic table."""
+    columns = SCHEMAS[schema]
+    metadata = {"bench": columns}
+    records = generate_records(columns, rows)
+    where = parser.parse_where_clause(_where_for(columns))
+    first_name = records[0]["name"]
+    results = []
+
+    def fresh_table():
+        return TableData([dict(record) for record in records], rows)
+
+    def timed(name, run, setup=None):
+        results.append(
+            _measure(name, schema, rows, repeat, run, setup or (lambda: None))
+        )
+
+    values = [
+        _sample_value(col_type, number)
+        for number, (name, col_type) in enumerate(columns.items())
+        if name != "ID"
+    ]
+    timed(
+        "core.insert",
+        lambda table: [
+            core.insert(metadata, "bench", values, table)
+            for _ in range(INSERT_ROWS)
+        ],
+        fresh_table,
+    )
+    timed(
+        "core.insert_many",
+        lambda table: core.insert_many(
+            metadata, "bench", [values] * INSERT_ROWS, table
+        ),
+        fresh_table,
+    )
+    table = fresh_table()
+    timed("core.select.scan", lambda _: core.select(table, where))
+    indexes = {"name": index.build_index(table, "name")}
+    equality = parser.parse_where_clause(f'name = "{first_name}"')
+    timed("core.select.index", lambda _: core.select(table, equality, indexes))
+    timed(
+        "core.aggregate.group_by",
+        lambda _: core.aggregate(
+            table, [("count", None), ("avg", "age")], ["active"]
+        ),
+    )
+    timed(
+        "core.update",
+        lambda table: core.update(table, {"age": 1}, where),
+        fresh_table,
+    )
+    timed("core.delete", lambda table: core.delete(table, where), fresh_table)
+    timed(
+        "parser.parse_statement.cold",
+        lambda texts: [_parse_uncached(text) for text in texts],
+        lambda: _statement_texts(PARSE_STATEMENTS),
+    )
+    timed(
+        "parser.parse_statement.template",
+        lambda texts: [parser.parse_statement(text) for text in texts],
+        lambda: _warm_template(_statement_texts(PARSE_STATEMENTS)),
+    )
+    repeated = _statement_texts(1)[0]
+    timed(
+        "parser.parse_statement.repeated",
+        lambda _: [parser.parse_statement(repeated) for _ in range(PARSE_STATEMENTS)],
+        lambda: parser.parse_statement(repeated),
+    )
+    # The engine parses WHERE as part of parse_statement; this entry times
+    # the standalone helper used by core-level callers only.
+    timed(
+        "parser.parse_where_clause.standalone",
+        lambda _: [
+            parser.parse_where_clause(WHERE_CLAUSE) for _ in range(PARSE_STATEMENTS)
+        ],
+    )
+    timed(
+        "engine._print_table",
+        lambda _: _print_table(columns, table[:RENDER_ROWS]),
+    )
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        timed(
+            "utils.save_table_data",
+            lambda _: save_table_data("bench", table, data_dir),
+        )
+        # Segmented tables read their segments lazily: read every record so
+        # the load is timed in full, not just the manifest.
+        timed(
+            "utils.load_table_data",
+            lambda _: list(load_table_data("bench", data_dir)),
+        )
+
+    return results
+
+
+def run_script_benchmark(rows: int, repeat: int) -> dict:
+    """Time a scripted session of the database CLI, end to end."""
+    columns = SCHEMAS["narrow"]
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_path = Path(work_dir) / "users.csv"
+        write_csv(csv_path, columns, generate_records(columns, rows))
+        script_path = Path(work_dir) / "session.txt"
+        script_path.write_text(
+            "\n".join([
+                "create_table users name:str age:int active:bool",
+                f"load users from {csv_path}",
+                "create_index users name",
+                'select from users where name = "user7"',
+                "select from users where age > 90 limit 100",
+                "select active, count(*), avg(age) from users group by active",
+                "update users set active = false where age = 42",
+                "delete from users where age < 5",
+                "info users",
+            ]) + "\n",
+            encoding="utf-8",
+        )
+
+        def setup():
+            for name in ("data", "db_meta.json"):
+                path = Path(work_dir) / name
+                if path.is_dir():
+                    for child in path.iterdir():
+                        child.unlink()
+                else:
+                    path.unlink(missing_ok=True)
+
+        def run(_):
+            subprocess.run(
+                [
+                    sys.executable, "-m", "src.primitive_db.main",
+                    "--script", str(script_path), "--yes",
+                ],
+                cwd=work_dir,
+                env={**os.environ, "PYTHONPATH": str(ROOT)},
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+
+        return _measure("script.session", "narrow", rows, repeat, run, setup)
+
+
+def run_startup_benchmarks(repeat: int) -> list:
+    """Time a one-shot command against the bare interpreter startup."""
+    columns = SCHEMAS["narrow"]
+    rows = STARTUP_ROWS
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_path = Path(work_dir) / "users.csv"
+        write_csv(csv_path, columns, generate_records(columns, rows))
+        database = [sys.executable, "-m", "src.primitive_db.main"]
+        for command in (
+            "create_table users name:str age:int active:bool",
+            f"load users from {csv_path}",
+        ):
+            subprocess.run(
+                [*database, "-c", command],
+                cwd=work_dir,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+
+        def timed(name, args):
+            def run(_):
+                subprocess.run(
+                    args,
+                    cwd=work_dir,
+                    env=env,
+                    stdout=subprocess.DEVNULL,
+                    check=True,
+                )
+
+            return _measure(name, "narrow", rows, repeat, run, lambda: None)
+
+        return [
+            timed("startup.interpreter", [sys.executable, "-c", "pass"]),
+            timed("startup.list_tables", [*database, "-c", "list_tables"]),
+            timed(
+                "startup.select",
+                [*database, "-c", "select from users where ID = 7"],
+            ),
+        ]
+
+
+def generate_records(columns: dict, rows: int) -> list:
+    """Generate reproducible records for a schema."""
+    rng = random.Random(SEED)
+    records = []
+    for record_id in range(1, rows + 1):
+        record = {"ID": record_id}
+        for name, col_type in columns.items():
+            if name == "ID":
+                continue
+            if col_type == "int":
+                record[name] = rng.randrange(100)
+            elif col_type == "bool":
+                record[name] = rng.random() < 0.5
+            elif name == "name":
+                record[name] = f"user{rng.randrange(rows)}"
+            else:
+                record[name] = f"{name}{rng.randrange(1000)}"
+        records.append(record)
+    return records
+
+
+def write_csv(path: Path, columns: dict, records: list) -> None:
+    """Write records without IDs as a CSV file for the load command."""
+    names = [name for name in columns if name != "ID"]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        for record in records:
+            writer.writerow([record[name] for name in names])
+
+
+def compare(baseline: list, results: list, threshold: float) -> bool:
+    """Print timing ratios against a baseline and check them."""
+    old = {_key(result): result["median"] for result in baseline}
+    ok = True
+    for result in results:
+        before = old.get(_key(result))
+        if not before:
+            continue
+        ratio = result["median"] / before
+        slower = ratio > threshold
+        ok = ok and not slower
+        mark = "  МЕДЛЕННЕЕ" if slower else ""
+        print(
+            f"{result['name']:<28} {result['schema']:<7} {result['rows']:>9} "
+            f"{before:.6f} -> {result['median']:.6f} ({ratio:.2f}x){mark}",
+            file=sys.stderr,
+        )
+    return ok
+
+
+def _measure(name, schema, rows, repeat, run, setup) -> dict:
+    """Time `run(setup())` `repeat` times with output suppressed."""
+    timings = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            state = setup()
+            start = time.perf_counter()
+            run(state)
+            timings.append(time.perf_counter() - start)
+    return {
+        "name": name,
+        "schema": schema,
+        "rows": rows,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+    }
+
+
+def _key(result: dict) -> tuple:
+    return result["name"], result["schema"], result["rows"]
+
+
+def _where_for(columns: dict) -> str:
+    """Return a WHERE clause over columns every schema has."""
+    return 'age > 50 or name = "user7"' if "score" not in columns else WHERE_CLAUSE
+
+
+def _statement_texts(count: int) -> list:
+    """Return same-shape select commands differing only in their literals."""
+    return [
+        f'select from bench where age > {number} and name = "user{number}" '
+        f"limit {number % 50 + 1}"
+        for number in range(count)
+    ]
+
+
+def _clear_statement_caches() -> None:
+    parser._statements.clear()
+    parser._templates.clear()
+
+
+def _parse_uncached(text: str):
+    """Parse a command with both statement caches empty."""
+    _clear_statement_caches()
+    return parser.parse_statement(text)
+
+
+def _warm_template(texts: list) -> list:
+    """Empty the statement caches and cache only the shared template of texts.
+
+    The warm-up command differs from all texts in its literals, so every
+    text misses the exact-text cache and hits the template cache.
+    """
+    _clear_statement_caches()
+    parser.parse_statement(texts[0].replace("age > 0 ", "age > 999999 ", 1))
+    return texts
+
+
+def _sample_value(col_type: str, number: int):
+    if col_type == "int":
+        return number
+    if col_type == "bool":
+        return True
+    return f"value{number}"
+
+
+def _parse_args() -> argparse.Namespace:
+    arg_parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Замеры производительности основных операций базы данных.",
+    )
+    arg_parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_SIZES),
+        metavar="N",
+        help="размеры таблиц в строках (по умолчанию 1000 100000; "
+             "полный прогон - 1000 100000 1000000)",
+    )
+    arg_parser.add_argument(
+        "--schemas",
+        nargs="+",
+        choices=sorted(SCHEMAS),
+        default=sorted(SCHEMAS),
+        help="схемы таблиц",
+    )
+    arg_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="число повторов каждого замера (по умолчанию 3)",
+    )
+    arg_parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help="записать результаты в JSON-файл вместо stdout",
+    )
+    arg_parser.add_argument(
+        "--compare",
+        metavar="FILE",
+        help="сравнить с предыдущими результатами",
+    )
+    arg_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="допустимое замедление медианы при --compare (по умолчанию 1.2)",
+    )
+    arg_parser.add_argument(
+        "--skip-script",
+        action="store_true",
+        help="не запускать сквозной замер пакетного режима",
+    )
+    return arg_parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""Memory-mapped fixed-width binary table format.
+
+A table lives in two files. `<table>.bin` starts with a HEADER_SIZE byte
+header (magic, sequence, slot and live row counters, schema as JSON) and
+continues with fixed-width records, one slot per ID: the record with ID n
+is stored in slot n - 1. Every record is a live flag byte followed by the
+columns in schema order: int as a signed 64-bit integer, bool as one byte,
+str as (offset, length) into `<table>.heap`, which holds the UTF-8 bytes of
+all strings. Deleted records are tombstoned by clearing the live flag.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+from collections.abc import MutableMapping
+from itertools import compress
+from pathlib import Path
+from typing import Optional
+
+HEADER_SIZE = 4096
+_MAGIC = b"PDB1"
+# sequence, slots, live rows, schema length
+_COUNTERS = struct.Struct("<qqqI")
+_FIELD_FORMATS = {"int": "q", "bool": "?", "str": "qq"}
+_MIN_CAPACITY = 1024
+
+
+class BinaryTable:
+    """Table data accessed in place through mmap.
+
+    Positions are slot numbers, so position_of() is a direct computation and
+    updates of fixed-width columns are written straight into the mapping.
+    """
+
+    def __init__(self, path: Path, heap_path: Path, readonly: bool = False):
+        self.path = Path(path)
+        self.heap_path = Path(heap_path)
+        self.readonly = readonly
+        if readonly:
+            self._file = open(path, "rb")
+            self._heap = open(heap_path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._file = open(path, "r+b")
+            self._heap = open(heap_path, "a+b")
+            self._map = mmap.mmap(self._file.fileno(), 0)
+        self._heap_map = None
+        self._remap_lock = threading.Lock()
+
+        if self._map[:4] != _MAGIC:
+            raise ValueError(f'"{path}" не является бинарной таблицей.')
+        sequence, slots, live, schema_size = _COUNTERS.unpack_from(self._map, 4)
+        start = 4 + _COUNTERS.size
+        self.columns = json.loads(self._map[start:start + schema_size])
+        self._sequence, self._slots, self._live = sequence, slots, live
+        self._first = 0
+
+        self._record = struct.Struct(
+            "<B" + "".join(_FIELD_FORMATS[t] for t in self.columns.values())
+        )
+        self._fields = {}
+        field = 1
+        for name, col_type in self.columns.items():
+            self._fields[name] = (field, col_type)
+            field += 2 if col_type == "str" else 1
+
+    @classmethod
+    def create(
+        cls,
+        path: Path,
+        heap_path: Path,
+        columns: dict,
+        records=(),
+        sequence: int = 0,
+    ) -> "BinaryTable":
+        """Write a new binary table with the given records and open it."""
+        schema = json.dumps(columns).encode("utf-8")
+        if 4 + _COUNTERS.size + len(schema) > HEADER_SIZE:
+            raise ValueError("Схема таблицы не помещается в заголовок.")
+
+        with open(path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(_COUNTERS.pack(0, 0, 0, len(schema)))
+            f.write(schema)
+            f.truncate(HEADER_SIZE)
+        open(heap_path, "wb").close()
+
+        table = cls(path, heap_path)
+        for record in records:
+            table.append(record)
+        table.sequence = max(sequence, table.sequence)
+        table.flush()
+        return table
+
+    @property
+    def sequence(self) -> int:
+        return self._sequence
+
+    @sequence.setter
+    def sequence(self, value: int) -> None:
+        self._sequence = value
+        self._write_counters()
+
+    @property
+    def slots(self) -> int:
+        """Number of slots, live or deleted; positions are below it."""
+        return self._slots
+
+    def __len__(self) -> int:
+        return self._live
+
+    def __getitem__(self, position: int) -> "BinaryRow":
+        if position < 0:
+            position += self._slots
+        if not 0 <= position < self._slots:
+            raise IndexError("table position out of range")
+        return BinaryRow(self, position)
+
+    def __iter__(self):
+        for position in self.positions():
+            yield BinaryRow(self, position)
+
+    def positions(self):
+        """Iterate over the slots holding live records."""
+        return compress(range(self._first, self._slots), self._field_values(0))
+
+    def position_of(self, record_id: int) -> Optional[int]:
+        """Return the slot of a record by ID, or None if it does not exist."""
+        position = record_id - 1
+        if 0 <= position < self._slots and self._is_live(position):
+            return position
+        return None
+
+    def column(self, name: str):
+        """Iterate over the values of one column for live records."""
+        if name not in self._fields:
+            return iter(())
+        field, col_type = self._fields[name]
+        live = self._field_values(0)
+        if col_type == "str":
+            values = self._field_values(field, 2)
+            return (
+                self._read_str(offset, length)
+                for offset, length in compress(values, live)
+            )
+        return compress(self._field_values(field), live)
+
+    def append(self, record: dict) -> None:
+        """Store a record in the slot of its ID."""
+        position = record["ID"] - 1
+        if position < self._slots and self._is_live(position):
+            raise ValueError(f'Запись с ID={record["ID"]} уже существует.')
+        if position >= self._slots:
+            self._reserve(position + 1)
+            self._slots = position + 1
+
+        fields = [1]
+        for name, col_type in self.columns.items():
+            fields.extend(self._encode(record[name], col_type))
+        self._record.pack_into(self._map, self._offset(position), *fields)
+        self._live += 1
+        self._sequence = max(self._sequence, record["ID"])
+        self._write_counters()
+
+    def delete_positions(self, positions) -> None:
+        """Tombstone the records in the given slots."""
+        for position in set(positions):
+            if self._is_live(position):
+                self._map[self._offset(position)] = 0
+                self._live -= 1
+        self._write_counters()
+
+    def get_value(self, position: int, name: str):
+        field, col_type = self._fields[name]
+        values = self._record.unpack_from(self._map, self._offset(position))
+        if col_type == "str":
+            return self._read_str(values[field], values[field + 1])
+        return values[field]
+
+    def set_value(self, position: int, name: str, value) -> None:
+        field, col_type = self._fields[name]
+        fields = list(self._record.unpack_from(self._map, self._offset(position)))
+        width = 2 if col_type == "str" else 1
+        fields[field:field + width] = self._encode(value, col_type)
+        self._record.pack_into(self._map, self._offset(position), *fields)
+
+    def restrict(self, start: int, stop: int) -> None:
+        """Limit positions(), column() and len() to the slots start..stop.
+
+        Used by read-only tables that scan one range of a larger table.
+        """
+        self._first = start
+        self._slots = min(stop, self._slots)
+        self._live = sum(self._field_values(0))
+
+    def share(self) -> None:
+        """Make written strings visible to other processes mapping the files.
+
+        Records are written into the shared mapping directly; strings go
+        through the buffered heap file.
+        """
+        self._heap.flush()
+
+    def flush(self) -> None:
+        """Flush the mapping and the heap to disk."""
+        self._map.flush()
+        self._heap.flush()
+        os.fsync(self._heap.fileno())
+
+    def close(self) -> None:
+        """Release the mappings and file handles."""
+        if not self.readonly:
+            self.flush()
+        if self._heap_map is not None:
+            self._heap_map.close()
+        self._map.close()
+        self._file.close()
+        self._heap.close()
+
+    def _offset(self, position: int) -> int:
+        return HEADER_SIZE + position * self._record.size
+
+    def _is_live(self, position: int) -> bool:
+        return self._map[self._offset(position)] == 1
+
+    def _field_values(self, field: int, width: int = 1):
+        """Iterate over one field (or `width` adjacent fields) of every slot."""
+        start, end = self._offset(self._first), self._offset(self._slots)
+        with memoryview(self._map)[start:end] as records:
+            for values in self._record.iter_unpack(records):
+                if width == 1:
+                    yield values[field]
+                else:
+                    yield values[field:field + width]
+
+    def _reserve(self, slots: int) -> None:
+        """Grow the file so that it holds at least `slots` records."""
+        capacity = (len(self._map) - HEADER_SIZE) // self._record.size
+        if slots <= capacity:
+            return
+        capacity = max(_MIN_CAPACITY, capacity * 2, slots)
+        self._map.close()
+        self._file.truncate(self._offset(capacity))
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def _write_counters(self) -> None:
+        schema_size = _COUNTERS.unpack_from(self._map, 4)[3]
+        _COUNTERS.pack_into(
+            self._map, 4, self._sequence, self._slots, self._live, schema_size
+        )
+
+    def _encode(self, value, col_type: str) -> tuple:
+        """Return the record fields of a column value."""
+        if col_type == "int":
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise ValueError(
+                    f"ожидается тип int, получено {type(value).__name__}."
+                )
+            return (value,)
+        if col_type == "bool":
+            if not isinstance(value, bool):
+                raise ValueError(
+                    f"ожидается тип bool, получено {type(value).__name__}."
+                )
+            return (value,)
+        if not isinstance(value, str):
+            raise ValueError(
+                f"ожидается тип str, получено {type(value).__name__}."
+            )
+        data = value.encode("utf-8")
+        self._heap.seek(0, os.SEEK_END)
+        offset = self._heap.tell()
+        self._heap.write(data)
+        return offset, len(data)
+
+    def _read_str(self, offset: int, length: int) -> str:
+        """Read a string from the heap, remapping it once it has grown.
+
+        Concurrent readers remap once under a lock and each reads through
+        its own reference; a replaced mapping is not closed, since other
+        readers may still use it, and is unmapped when no longer referenced.
+        """
+        if not length:
+            return ""
+        heap_map = self._heap_map
+        if heap_map is None or offset + length > len(heap_map):
+            with self._remap_lock:
+                heap_map = self._heap_map
+                if heap_map is None or offset + length > len(heap_map):
+                    self._heap.flush()
+                    heap_map = mmap.mmap(
+                        self._heap.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+                    self._heap_map = heap_map
+        return heap_map[offset:offset + length].decode("utf-8")
+
+
+class BinaryRow(MutableMapping):
+    """Dict-like view of one slot of a BinaryTable."""
+
+    __slots__ = ("_table", "_position")
+
+    def __init__(self, table: BinaryTable, position: int):
+        self._table = table
+        self._position = position
+
+    def __getitem__(self, name: str):
+        if name not in self._table.columns:
+            raise KeyError(name)
+        return self._table.get_value(self._position, name)
+
+    def __setitem__(self, name: str, value) -> None:
+        if name not in self._table.columns:
+            raise KeyError(name)
+        self._table.set_value(self._position, name, value)
+
+    def __delitem__(self, name: str) -> None:
+        raise TypeError("columns of a row cannot be deleted")
+
+    def __contains__(self, name) -> bool:
+        return name in self._table.columns
+
+    def __iter__(self):
+        return iter(self._table.columns)
+
+    def __len__(self) -> int:
+        return len(self._table.columns)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
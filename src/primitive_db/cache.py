@@ -0,0 +1,291 @@
+"""In-process buffer cache for metadata and table data."""
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Optional
+
+from src.primitive_db import metrics
+from src.primitive_db.columnar import ColumnarTable
+from src.primitive_db.constants import (
+    CACHE_MAX_ROWS,
+    DATA_DIR,
+    METADATA_FILE,
+    QUERY_CACHE_ENTRIES,
+    QUERY_CACHE_MAX_ROWS,
+    TABLE_LAYOUT,
+)
+from src.primitive_db.decorators import create_cacher
+from src.primitive_db.utils import (
+    TableData,
+    append_table_log,
+    load_indexes,
+    load_metadata,
+    load_table_data,
+    metadata_lock,
+    table_files,
+    table_lock,
+)
+
+
+class _Entry:
+    """Cached state of one table."""
+
+    def __init__(self, data, stamp: tuple):
+        self.data = data
+        self.stamp = stamp
+        self.indexes = None
+        self.pending = []
+        # Exclusive table lock kept while pending mutations are unwritten.
+        self.hold = None
+
+
+class TableCache:
+    """LRU cache of parsed tables shared across commands.
+
+    Entries are revalidated against the mtime and size of the table files,
+    so changes made by other processes are picked up. Mutations go through
+    commit(); with autoflush disabled they stay pending until flush(), and
+    the table stays exclusively locked until then, so no other process can
+    change the files the pending log entries are based on.
+    With layout="columnar" tables from JSON storage are held as
+    ColumnarTable; segmented tables stay rows loaded per segment and binary
+    tables are always used in place. The cache may be
+    shared by threads; callers still have to keep writers apart from readers.
+    
+    Every table has a version that changes with each write and reload;
+    query_results caches (rows, error) select results under keys that
+    include it, so a write invalidates exactly the results of its table.
+    """
+
+    def __init__(
+        self,
+        max_rows: int = CACHE_MAX_ROWS,
+        data_dir: str = DATA_DIR,
+        metadata_file: str = METADATA_FILE,
+        autoflush: bool = True,
+        layout: str = TABLE_LAYOUT,
+    ):
+        self.max_rows = max_rows
+        self.data_dir = data_dir
+        self.metadata_file = metadata_file
+        self.autoflush = autoflush
+        self.layout = layout
+        self._entries = OrderedDict()
+        self._metadata = None
+        self._metadata_stamp = None
+        self._lock = threading.RLock()
+        self._versions = {}
+        self._pins = {}
+        self.query_results = create_cacher(
+            QUERY_CACHE_ENTRIES, QUERY_CACHE_MAX_ROWS, _result_rows
+        )
+
+    def metadata(self) -> dict:
+        """Return table metadata, re-reading the file only if it changed."""
+        with self._lock:
+            stamp = _file_stamp(Path(self.metadata_file))
+            if self._metadata is None or stamp != self._metadata_stamp:
+                self._metadata = load_metadata(self.metadata_file)
+                self._metadata_stamp = stamp
+            return self._metadata
+
+    def table(self, table_name: str):
+        """Return table data, loading it on a miss or after external changes."""
+        with self._lock:
+            return self._entry(table_name).data
+
+    def version(self, table_name: str) -> int:
+        """Return the version of a table, changed by every write or reload."""
+        with self._lock:
+            return self._versions.get(table_name, 0)
+
+    def indexes(self, table_name: str) -> dict:
+        """Return the hash indexes of a table."""
+        with self._lock:
+            entry = self._entry(table_name)
+            if entry.indexes is None:
+                with metrics.phase("load"):
+                    entry.indexes = load_indexes(table_name, self.data_dir)
+            return entry.indexes
+
+    def commit(self, table_name: str, entries: list) -> None:
+        """Record log entries for mutations already applied to the cached data."""
+        with self._lock:
+            entry = self._entries.get(table_name)
+            if entry is None or not entries:
+                return
+            self._bump(table_name)
+            entry.pending.extend(entries)
+            if self.autoflush:
+                self._flush_entry(table_name, entry)
+            else:
+                if entry.hold is None:
+                    # Already held by the running command: only extends it.
+                    entry.hold = ExitStack()
+                    entry.hold.enter_context(
+                        table_lock(table_name, self.data_dir, exclusive=True)
+                    )
+                # Binary tables are changed in place, which is not an external
+                # change of the files.
+                entry.stamp = self._stamp(table_name)
+
+    def touch(self, table_name: str) -> None:
+        """Accept the current table files as matching the cached state."""
+        with self._lock:
+            self._bump(table_name)
+            entry = self._entries.get(table_name)
+            if entry is not None:
+                entry.stamp = self._stamp(table_name)
+
+    def flush(self) -> None:
+        """Write pending mutations of all tables."""
+        with self._lock:
+            for table_name, entry in self._entries.items():
+                self._flush_entry(table_name, entry)
+
+    @contextmanager
+    def locked(
+        self,
+        table_names: tuple = (),
+        exclusive: bool = False,
+        schema: bool = False,
+    ):
+        """Hold file locks on tables (and the metadata) for one command.
+
+        Cached data is revalidated whenever it is taken, so inside the block
+        a read-modify-write cycle sees the latest state and other processes
+        cannot interleave with it. The metadata is locked first (exclusively
+        for schema changes), then the tables in name order, so every command
+        takes the locks in the same order. Tables are not evicted from the
+        cache until the block ends.
+
+        Pending mutations are flushed before a schema change, since their
+        table locks would otherwise be held while waiting for the metadata.
+        """
+        table_names = sorted(set(table_names))
+        if schema:
+            self.flush()
+        with ExitStack() as stack:
+            if schema or table_names:
+                stack.enter_context(
+                    metadata_lock(self.metadata_file, exclusive=schema)
+                )
+            for table_name in table_names:
+                stack.enter_context(table_lock(table_name, self.data_dir, exclusive))
+            self._pin(table_names, 1)
+            stack.callback(self._pin, table_names, -1)
+            yield
+
+    def invalidate(self, table_name: str) -> None:
+        """Forget a table, dropping its pending mutations."""
+        with self._lock:
+            self._bump(table_name)
+            entry = self._entries.pop(table_name, None)
+            if entry is not None:
+                entry.pending = []
+                _unhold(entry)
+                _release(entry)
+
+    def _entry(self, table_name: str) -> _Entry:
+        """Get a fresh cache entry, moving it to the most recent position."""
+        entry = self._entries.get(table_name)
+        if entry is not None:
+            if entry.stamp == self._stamp(table_name):
+                self._entries.move_to_end(table_name)
+                return entry
+            self._flush_entry(table_name, entry)
+            del self._entries[table_name]
+            _release(entry)
+
+        with metrics.phase("load"):
+            data = load_table_data(table_name, self.data_dir)
+        metrics.count("loaded", len(data))
+        columns = self.metadata().get(table_name)
+        if self.layout == "columnar" and columns and isinstance(data, TableData):
+            data = ColumnarTable(columns, data, data.sequence)
+        entry = _Entry(data, self._stamp(table_name))
+        self._entries[table_name] = entry
+        self._bump(table_name)
+        self._evict()
+        return entry
+
+    def _bump(self, table_name: str) -> None:
+        """Move a table to a new version, invalidating cached results."""
+        self._versions[table_name] = self._versions.get(table_name, 0) + 1
+
+    def _evict(self) -> None:
+        """Drop least recently used tables until the row budget is met.
+
+        Tables used by a running command (see locked()) are kept.
+        """
+        total = sum(len(entry.data) for entry in self._entries.values())
+        for table_name in list(self._entries):
+            if total <= self.max_rows or len(self._entries) <= 1:
+                break
+            if self._pins.get(table_name):
+                continue
+            entry = self._entries.pop(table_name)
+            self._flush_entry(table_name, entry)
+            total -= len(entry.data)
+            _release(entry)
+
+    def _pin(self, table_names: list, delta: int) -> None:
+        """Count commands using the tables, protecting them from eviction."""
+        with self._lock:
+            for table_name in table_names:
+                pins = self._pins.get(table_name, 0) + delta
+                if pins:
+                    self._pins[table_name] = pins
+                else:
+                    self._pins.pop(table_name, None)
+
+    def _flush_entry(self, table_name: str, entry: _Entry) -> None:
+        """Append pending mutations of one table to its log."""
+        if not entry.pending:
+            return
+        with metrics.phase("save"):
+            append_table_log(
+                table_name, entry.pending, entry.data, self.data_dir, entry.indexes
+            )
+        metrics.count("logged", len(entry.pending))
+        entry.pending = []
+        entry.stamp = self._stamp(table_name)
+        _unhold(entry)
+
+    def _stamp(self, table_name: str) -> tuple:
+        """Return the mtime/size signature of the table files."""
+        return tuple(
+            _file_stamp(path) for path in table_files(table_name, self.data_dir)
+        )
+
+
+def _result_rows(result: tuple) -> int:
+    """Return the row count of a cached (rows, error) query result."""
+    rows, _ = result
+    return 0 if rows is None else len(rows)
+
+
+def _unhold(entry: _Entry) -> None:
+    """Release the table lock kept for pending mutations, if any."""
+    if entry.hold is not None:
+        entry.hold.close()
+        entry.hold = None
+
+
+def _release(entry: _Entry) -> None:
+    """Close the files held by a dropped entry, if any."""
+    close = getattr(entry.data, "close", None)
+    if close is not None:
+        close()
+
+
+def _file_stamp(path: Path) -> Optional[tuple]:
+    """Return (mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,235 @@
+"""Columnar in-memory representation of table data."""
+
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping
+from typing import Optional
+
+# Below this many deleted rows, deleting in place beats rebuilding columns.
+_INPLACE_DELETE_LIMIT = 64
+
+
+class IntColumn:
+    """int values packed into a signed 64-bit array."""
+
+    def __init__(self):
+        self.values = array("q")
+
+    def get(self, position: int) -> int:
+        return self.values[position]
+
+    def set(self, position: int, value) -> None:
+        self.values[position] = _check_type(value, "int")
+
+    def append(self, value) -> None:
+        self.values.append(_check_type(value, "int"))
+
+    def delete(self, position: int) -> None:
+        del self.values[position]
+
+    def keep(self, positions) -> None:
+        values = self.values
+        self.values = array("q", [values[position] for position in positions])
+
+    def __iter__(self):
+        return iter(self.values)
+
+
+class BoolColumn:
+    """bool values stored one byte per row."""
+
+    def __init__(self):
+        self.values = bytearray()
+
+    def get(self, position: int) -> bool:
+        return self.values[position] == 1
+
+    def set(self, position: int, value) -> None:
+        self.values[position] = _check_type(value, "bool")
+
+    def append(self, value) -> None:
+        self.values.append(_check_type(value, "bool"))
+
+    def delete(self, position: int) -> None:
+        del self.values[position]
+
+    def keep(self, positions) -> None:
+        values = self.values
+        self.values = bytearray([values[position] for position in positions])
+
+    def __iter__(self):
+        return map(bool, self.values)
+
+
+class StrColumn:
+    """str values dictionary-encoded as codes into a list of distinct strings.
+
+    Strings that are no longer referenced stay in the dictionary until the
+    table is reloaded.
+    """
+
+    def __init__(self):
+        self.codes = array("q")
+        self.strings = []
+        self.lookup = {}
+
+    def get(self, position: int) -> str:
+        return self.strings[self.codes[position]]
+
+    def set(self, position: int, value) -> None:
+        self.codes[position] = self._encode(value)
+
+    def append(self, value) -> None:
+        self.codes.append(self._encode(value))
+
+    def delete(self, position: int) -> None:
+        del self.codes[position]
+
+    def keep(self, positions) -> None:
+        codes = self.codes
+        self.codes = array("q", [codes[position] for position in positions])
+
+    def __iter__(self):
+        return map(self.strings.__getitem__, self.codes)
+
+    def _encode(self, value) -> int:
+        value = _check_type(value, "str")
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(value)
+            self.lookup[value] = code
+        return code
+
+
+_COLUMN_TYPES = {"int": IntColumn, "bool": BoolColumn, "str": StrColumn}
+
+
+class ColumnarTable:
+    """Table data stored column by column according to the table schema.
+
+    Behaves like the list of records it replaces: positions, len(), append()
+    and iteration work the same, but rows are exposed as ColumnarRow views
+    instead of dicts.
+    """
+
+    def __init__(self, columns: dict, records=(), sequence: int = 0):
+        self.columns = dict(columns)
+        self.sequence = sequence
+        self._columns = {
+            name: _COLUMN_TYPES[col_type]() for name, col_type in columns.items()
+        }
+        for record in records:
+            self.append(record)
+
+    def __len__(self) -> int:
+        return len(self._columns["ID"].values)
+
+    def __getitem__(self, position: int) -> "ColumnarRow":
+        size = len(self)
+        if position < 0:
+            position += size
+        if not 0 <= position < size:
+            raise IndexError("table position out of range")
+        return ColumnarRow(self, position)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield ColumnarRow(self, position)
+
+    def append(self, record: dict) -> None:
+        """Append a record given as a dict with every schema column."""
+        for name, column in self._columns.items():
+            column.append(record[name])
+
+    def positions(self):
+        """Iterate over the positions of all rows."""
+        return iter(range(len(self)))
+
+    def position_of(self, record_id: int) -> Optional[int]:
+        """Find the position of a row by ID with a bisect over the ID column."""
+        ids = self._columns["ID"].values
+        position = bisect_left(ids, record_id)
+        if position < len(ids) and ids[position] == record_id:
+            return position
+        return None
+
+    def column(self, name: str):
+        """Iterate over the values of one column in row order."""
+        if name not in self._columns:
+            return iter(())
+        return iter(self._columns[name])
+
+    def delete_positions(self, positions) -> None:
+        """Delete rows at the given positions."""
+        positions = sorted(set(positions))
+        if len(positions) < _INPLACE_DELETE_LIMIT:
+            for position in reversed(positions):
+                for column in self._columns.values():
+                    column.delete(position)
+            return
+
+        dropped = set(positions)
+        kept = [position for position in range(len(self)) if position not in dropped]
+        for column in self._columns.values():
+            column.keep(kept)
+
+    def get_value(self, position: int, name: str):
+        return self._columns[name].get(position)
+
+    def set_value(self, position: int, name: str, value) -> None:
+        self._columns[name].set(position, value)
+
+
+class ColumnarRow(MutableMapping):
+    """Dict-like view of one row of a ColumnarTable.
+
+    The view is bound to a position, so it must not outlive deletions.
+    """
+
+    __slots__ = ("_table", "_position")
+
+    def __init__(self, table: ColumnarTable, position: int):
+        self._table = table
+        self._position = position
+
+    def __getitem__(self, name: str):
+        if name not in self._table.columns:
+            raise KeyError(name)
+        return self._table.get_value(self._position, name)
+
+    def __setitem__(self, name: str, value) -> None:
+        if name not in self._table.columns:
+            raise KeyError(name)
+        self._table.set_value(self._position, name, value)
+
+    def __delitem__(self, name: str) -> None:
+        raise TypeError("columns of a row cannot be deleted")
+
+    def __contains__(self, name) -> bool:
+        return name in self._table.columns
+
+    def __iter__(self):
+        return iter(self._table.columns)
+
+    def __len__(self) -> int:
+        return len(self._table.columns)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+def _check_type(value, expected_type: str):
+    """Validate a value against a column type, returning its stored form."""
+    if expected_type == "int":
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+    elif expected_type == "bool":
+        if isinstance(value, bool):
+            return int(value)
+    elif expected_type == "str":
+        if isinstance(value, str):
+            return value
+    raise ValueError(
+        f"ожидается тип {expected_type}, получено {type(value).__name__}."
+    )
@@ -6,3 +6,65 @@ DATA_DIR = "data"
 
 # Valid types
 VALID_TYPES = ("int", "str", "bool")
+
+# Append-only table log
+LOG_SUFFIX = ".log"
+# The log is compacted into the base file once it outgrows both this size
+# and the base file itself, so rewrites stay amortised O(1) per mutation.
+LOG_COMPACT_MIN_BYTES = 64 * 1024
+
+# Hash index snapshots, rewritten together with the base table file
+INDEX_SUFFIX = ".idx.json"
+
+# Sorted indexes serve range conditions selecting at most this share of the
+# table; wider ranges are cheaper to scan
+RANGE_INDEX_MAX_SHARE = 0.2
+
+# Buffer cache: total number of rows kept in memory across cached tables
+CACHE_MAX_ROWS = 1_000_000
+
+# In-memory table layout: "rows" (list of dicts) or "columnar" (typed arrays).
+# Only tables in JSON storage are held as columns; segmented and binary
+# tables keep their own representation.
+TABLE_LAYOUT = "rows"
+
+# Bulk load: records validated and appended per batch
+LOAD_BATCH_SIZE = 10_000
+
+# Select output: formats and rows per rendered table page
+OUTPUT_FORMATS = ("table", "csv", "jsonl")
+RENDER_PAGE_SIZE = 500
+
+# ORDER BY without LIMIT: rows sorted in memory per run; longer inputs are
+# spilled to temporary files run by run and merged
+SORT_RUN_ROWS = 100_000
+
+# Table storage backends: "segments" (segment files + log), "json" (one
+# base file + log) or "binary" (mmap records). New tables are created in
+# JSON storage with the columnar layout, so that the layout applies to them.
+DEFAULT_STORAGE = "json" if TABLE_LAYOUT == "columnar" else "segments"
+BINARY_SUFFIX = ".bin"
+HEAP_SUFFIX = ".heap"
+# Segmented tables: manifest data/<table>.segments.json and the directory
+# data/<table>.segments/ with one file per SEGMENT_ROWS consecutive IDs
+SEGMENTS_SUFFIX = ".segments.json"
+SEGMENT_ROWS = 10_000
+
+# Query result cache: number of cached results and their total row count
+QUERY_CACHE_ENTRIES = 256
+QUERY_CACHE_MAX_ROWS = 100_000
+
+# Parallel scans: binary tables of at least PARALLEL_MIN_ROWS rows are
+# filtered and aggregated by worker processes, PARALLEL_CHUNK_ROWS slots
+# per task at most
+PARALLEL_MIN_ROWS = 500_000
+PARALLEL_CHUNK_ROWS = 250_000
+
+# Parsed statements cached by exact text and by shape (literals as "?")
+STATEMENT_CACHE_ENTRIES = 1024
+
+# Advisory lock files: data/<table>.lock and <METADATA_FILE>.lock
+LOCK_SUFFIX = ".lock"
+
+# Network server mode
+DEFAULT_PORT = 7433
@@ -1,11 +1,26 @@
 """Core database functionality."""
 
-from typing import Optional
-from pathlib import Path
+import heapq
+import json
+from itertools import compress, islice, repeat
+from operator import itemgetter
+from typing import NamedTuple, Optional
 
-from src.primitive_db.constants import METADATA_FILE, VALID_TYPES, DATA_DIR
+from src.primitive_db import index, parallel, predicate, schema
+from src.primitive_db.constants import (
+    DATA_DIR,
+    LOAD_BATCH_SIZE,
+    METADATA_FILE,
+    RANGE_INDEX_MAX_SHARE,
+    SORT_RUN_ROWS,
+    VALID_TYPES,
+)
 from src.primitive_db.decorators import confirm_action, handle_db_errors, log_time
-from src.primitive_db.utils import save_metadata
+from src.primitive_db.utils import (
+    delete_table_files,
+    save_indexes,
+    save_metadata,
+)
 
 
 def create_table(metadata: dict, table_name: str, columns_str: list) -> Optional[str]:
@@ -52,14 +67,68 @@ def drop_table(metadata: dict, table_name: str) -> Optional[str]:
     del metadata[table_name]
     save_metadata(METADATA_FILE, metadata)
 
-    # Delete data file
-    data_file = Path(DATA_DIR) / f"{table_name}.json"
-    if data_file.exists():
-        data_file.unlink()
+    # Delete data file and its log
+    delete_table_files(table_name, DATA_DIR)
 
     return None
 
 
+def create_index(
+    metadata: dict,
+    table_name: str,
+    column: str,
+    table_data: list,
+    indexes: dict,
+    kind: str = "hash",
+) -> Optional[str]:
+    """Create a hash or sorted index on a table column and save the indexes."""
+    if table_name not in metadata:
+        return f'Ошибка: Таблица "{table_name}" не существует.'
+    
+    if column not in metadata[table_name]:
+        return f'Ошибка: Столбец "{column}" не существует.'
+    
+    if column in indexes:
+        return f'Ошибка: Индекс по столбцу "{column}" уже существует.'
+    
+    indexes[column] = index.build_index(table_data, column, kind)
+    save_indexes(table_name, indexes, DATA_DIR)
+    return None
+
+
+def validate_where_clause(
+    where_clause: tuple,
+    table_columns: dict,
+) -> Optional[str]:
+    """Check that a WHERE clause uses existing columns and matching types."""
+    kind = where_clause[0]
+    if kind == "cmp":
+        _, _, column, value = where_clause
+        if column not in table_columns:
+            return f'Ошибка: Столбец "{column}" не существует.'
+        return _validate_value_type(value, table_columns[column])
+    
+    children = (where_clause[1],) if kind == "not" else where_clause[1]
+    for child in children:
+        error = validate_where_clause(child, table_columns)
+        if error:
+            return error
+    return None
+
+
+def validate_set_clause(set_clause: dict, table_columns: dict) -> Optional[str]:
+    """Check that a SET clause assigns existing columns values of their types."""
+    checks = schema.compile_schema(tuple(table_columns.items())).checks
+    for column, value in set_clause.items():
+        if column == "ID":
+            return 'Ошибка: Столбец "ID" зарезервирован.'
+        if column not in checks:
+            return f'Ошибка: Столбец "{column}" не существует.'
+        if not checks[column](value):
+            return schema.type_error(value, table_columns[column])
+    return None
+
+
 def validate_table_name(table_name: str) -> Optional[str]:
     """Validate table name."""
     if not table_name:
@@ -78,103 +147,432 @@ def insert(
     table_name: str,
     values: list,
     table_data: list,
+    indexes: Optional[dict] = None,
 ) -> tuple[list, Optional[str]]:
     """Insert a new record into a table."""
     if table_name not in metadata:
         raise KeyError(f'Таблица "{table_name}" не существует.')
     
-    table_columns = metadata[table_name]
-    expected_count = len(table_columns) - 1
+    new_id = table_data.sequence + 1
+    new_record = schema.for_table(metadata, table_name).build(new_id, values)
+    table_data.sequence = new_id
+    table_data.append(new_record)
+    index.add_record(indexes, new_record)
+    return table_data, None
+
+
+@handle_db_errors
+@log_time
+def insert_many(
+    metadata: dict,
+    table_name: str,
+    records,
+    table_data: list,
+    indexes: Optional[dict] = None,
+) -> tuple[int, Optional[str]]:
+    """Insert records streamed as dicts of column values or value lists.
+
+    Value lists hold the values in column order, like insert() takes them.
+    Records are validated and appended in batches of LOAD_BATCH_SIZE.
+    The table is left untouched if any record is invalid.
+    """
+    if table_name not in metadata:
+        raise KeyError(f'Таблица "{table_name}" не существует.')
+    
+    row_schema = schema.for_table(metadata, table_name)
+    build = row_schema.build
+    start_count = len(table_data)
+    start_sequence = table_data.sequence
+    
+    try:
+        batch = []
+        new_id = start_sequence
+        for number, record in enumerate(records, start=1):
+            new_id += 1
+            try:
+                if isinstance(record, dict):
+                    record = _record_values(row_schema, record)
+                batch.append(build(new_id, record))
+            except ValueError as e:
+                raise ValueError(f"запись {number}: {e}") from None
+            if len(batch) >= LOAD_BATCH_SIZE:
+                _append_batch(table_data, batch, indexes)
+                batch = []
+        _append_batch(table_data, batch, indexes)
+    except Exception:
+        positions = [
+            table_data.position_of(record_id)
+            for record_id in range(start_sequence + 1, table_data.sequence + 1)
+        ]
+        positions = [position for position in positions if position is not None]
+        for position in positions:
+            index.remove_record(indexes, table_data[position])
+        table_data.delete_positions(positions)
+        table_data.sequence = start_sequence
+        raise
     
-    if len(values) != expected_count:
-        raise ValueError(
-            f"Ожидается {expected_count} значений, получено {len(values)}."
+    return len(table_data) - start_count, None
+
+
+@handle_db_errors
+@log_time
+def select(
+    table_data: list,
+    where_clause: Optional[tuple] = None,
+    indexes: Optional[dict] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> list:
+    """Select records from table data."""
+    if where_clause is None and limit is None and not offset:
+        return table_data
+    
+    return list(iter_select(table_data, where_clause, indexes, limit, offset))
+
+
+def iter_select(
+    table_data: list,
+    where_clause: Optional[tuple] = None,
+    indexes: Optional[dict] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+):
+    """Lazily yield matching records, stopping the scan once limit is met."""
+    if where_clause is None:
+        records = iter(table_data)
+    else:
+        records = (
+            record
+            for _, record in _find_matches(table_data, where_clause, indexes)
         )
     
-    column_names = [k for k in table_columns.keys() if k != "ID"]
-    column_types = [table_columns[k] for k in column_names]
+    stop = None if limit is None else offset + limit
+    return islice(records, offset, stop)
+
+
+class JoinSide(NamedTuple):
+    """One table of a join: its data, join column and hash indexes."""
+    
+    table: str
+    data: list
+    column: str
+    indexes: Optional[dict] = None
+
+
+def join_columns(metadata: dict, left_table: str, right_table: str) -> dict:
+    """Return the columns of a join result: <table>.<column> -> type."""
+    return {
+        f"{table}.{column}": col_type
+        for table in (left_table, right_table)
+        for column, col_type in metadata[table].items()
+    }
+
+
+def resolve_join(
+    metadata: dict,
+    table_name: str,
+    join: tuple,
+    where_clause: Optional[tuple] = None,
+    order_column: Optional[str] = None,
+) -> tuple[Optional[tuple], Optional[str]]:
+    """Check a join and qualify the columns of its ON, WHERE and ORDER BY.
+
+    Columns are written as <table>.<column>, or bare when only one of the
+    tables has them. Returns ((left_column, right_column, where_clause,
+    order_column), None) with the ON columns as plain column names of their
+    tables and the others qualified, or (None, error).
+    """
+    right_table, first, second = join
+    for name in (table_name, right_table):
+        if name not in metadata:
+            return None, f'Ошибка: Таблица "{name}" не существует.'
+    if right_table == table_name:
+        return None, "Ошибка: Соединение таблицы с самой собой не поддерживается."
     
-    for value, expected_type in zip(values, column_types):
-        error = _validate_value_type(value, expected_type)
+    columns = join_columns(metadata, table_name, right_table)
+    owners = {}
+    bare = {}
+    for table in (table_name, right_table):
+        for column in metadata[table]:
+            owners[f"{table}.{column}"] = (table, column)
+            bare.setdefault(column, []).append(f"{table}.{column}")
+    names = {name: name for name in columns}
+    names.update(
+        (column, qualified[0]) for column, qualified in bare.items()
+        if len(qualified) == 1
+    )
+    
+    used = [first, second]
+    if order_column is not None:
+        used.append(order_column)
+    if where_clause is not None:
+        used.extend(predicate.columns_of(where_clause))
+    for column in used:
+        if column in names:
+            continue
+        if column in bare:
+            return None, (f'Ошибка: Столбец "{column}" есть в обеих таблицах,'
+                          f' укажите таблицу: <таблица>.{column}.')
+        return None, f'Ошибка: Столбец "{column}" не существует.'
+    
+    first, second = names[first], names[second]
+    if owners[first][0] == right_table:
+        first, second = second, first
+    if owners[first][0] != table_name or owners[second][0] != right_table:
+        return None, "Ошибка: Условие join должно связывать столбцы двух таблиц."
+    if columns[first] != columns[second]:
+        return None, f'Ошибка: Столбцы "{first}" и "{second}" имеют разные типы.'
+    
+    if where_clause is not None:
+        where_clause = predicate.rename_columns(where_clause, names)
+        error = validate_where_clause(where_clause, columns)
         if error:
-            raise ValueError(error)
+            return None, error
+    if order_column is not None:
+        order_column = names[order_column]
+    return (owners[first][1], owners[second][1], where_clause, order_column), None
+
+
+def iter_join(
+    left: JoinSide,
+    right: JoinSide,
+    where_clause: Optional[tuple] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+):
+    """Lazily yield joined records of two tables with equal join columns.
+
+    Records are keyed by <table>.<column>, the WHERE clause is qualified
+    the same way (see resolve_join). Its top-level AND terms over one table
+    filter that table before the join, through its indexes when they
+    apply; the other terms are checked on the joined records.
     
-    if table_data:
-        new_id = max(record["ID"] for record in table_data) + 1
-    else:
-        new_id = 1
+    A side joined on ID or on a column with a hash index is probed through
+    it and the other side is streamed. Otherwise a hash table of join value
+    -> positions is built over the smaller side and the larger one is
+    streamed, so a join takes O(n + m) time and memory proportional to the
+    build side. Records come in the order of the streamed side.
+    """
+    terms = {left.table: [], right.table: []}
+    residual = []
+    if where_clause is not None:
+        for term in predicate.conjuncts(where_clause):
+            tables = {
+                column.split(".", 1)[0] for column in predicate.columns_of(term)
+            }
+            if len(tables) == 1:
+                terms[tables.pop()].append(term)
+            else:
+                residual.append(term)
+    left_where = _side_where(left.table, terms[left.table])
+    right_where = _side_where(right.table, terms[right.table])
     
-    new_record = {"ID": new_id}
-    for column_name, value in zip(column_names, values):
-        new_record[column_name] = value
+    records = _join_records(left, left_where, right, right_where)
+    if residual:
+        test = predicate.compile_row_predicate(
+            residual[0] if len(residual) == 1 else ("and", tuple(residual))
+        )
+        records = filter(test, records)
     
-    table_data.append(new_record)
-    return table_data, None
+    stop = None if limit is None else offset + limit
+    return islice(records, offset, stop)
+
+
+def iter_select_ordered(
+    table_data: list,
+    column: str,
+    descending: bool = False,
+    where_clause: Optional[tuple] = None,
+    indexes: Optional[dict] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+):
+    """Lazily yield matching records ordered by one column.
+
+    Records are read in ID order, so ascending ID needs no sorting. A
+    sorted index on the column gives the order directly, unless an
+    equality index narrows the matches first; otherwise the matches are
+    sorted by iter_ordered().
+    """
+    if column == "ID" and not descending:
+        return iter_select(table_data, where_clause, indexes, limit, offset)
+    
+    column_index = (indexes or {}).get(column)
+    if isinstance(column_index, index.SortedIndex) and (
+        where_clause is None
+        or index.lookup(indexes, predicate.equality_terms(where_clause)) is None
+    ):
+        records = _iter_index_order(
+            table_data, column_index, column, descending, where_clause
+        )
+        stop = None if limit is None else offset + limit
+        return islice(records, offset, stop)
+    
+    records = iter_select(table_data, where_clause, indexes)
+    return iter_ordered(records, column, descending, limit, offset)
+
+
+def validate_order_by(order_by: tuple, columns: dict) -> Optional[str]:
+    """Check that the ORDER BY item is one of the output columns."""
+    (func, column), _ = order_by
+    name = aggregate_name(func, column)
+    if name in columns:
+        return None
+    if func is None:
+        return f'Ошибка: Столбец "{name}" не существует.'
+    return f'Ошибка: Для order by "{name}" должен быть в списке select.'
+
+
+def iter_ordered(
+    records,
+    column: str,
+    descending: bool = False,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    run_rows: int = SORT_RUN_ROWS,
+):
+    """Lazily yield records ordered by one column, ties in input order.
+
+    With a limit only the first offset + limit records are kept, in a
+    bounded heap: O(n log k) time and O(k) memory. Without one records are
+    sorted in runs of `run_rows`; longer inputs are spilled to temporary
+    files run by run and merged, so memory stays O(run_rows).
+    """
+    key = itemgetter(column)
+    if limit is not None:
+        return _top_records(records, key, descending, limit, offset)
+    return islice(_merge_sorted_runs(records, key, descending, run_rows), offset, None)
+
+
+def validate_aggregates(
+    items: list,
+    group_by: list,
+    table_columns: dict,
+) -> Optional[str]:
+    """Check the select list and GROUP BY columns of an aggregate query."""
+    for column in group_by:
+        if column not in table_columns:
+            return f'Ошибка: Столбец "{column}" не существует.'
+    
+    for func, column in items:
+        if column is None:
+            continue
+        if column not in table_columns:
+            return f'Ошибка: Столбец "{column}" не существует.'
+        if func is None and column not in group_by:
+            return (f'Ошибка: Столбец "{column}" должен быть в group by'
+                    f' или внутри агрегатной функции.')
+        if func in ("sum", "avg") and table_columns[column] != "int":
+            return f'Ошибка: {func} применима только к столбцам типа int.'
+    return None
+
+
+def aggregate_name(func: Optional[str], column: Optional[str]) -> str:
+    """Return the output column name of a select list item."""
+    if func is None:
+        return column
+    return f"{func}({column or '*'})"
 
 
 @handle_db_errors
 @log_time
-def select(
+def aggregate(
     table_data: list,
-    where_clause: Optional[dict] = None,
-) -> list:
-    """Select records from table data."""
-    if where_clause is None:
-        return table_data
+    items: list,
+    group_by: list = (),
+    where_clause: Optional[tuple] = None,
+    indexes: Optional[dict] = None,
+) -> tuple[list, Optional[str]]:
+    """Compute aggregates over matching records in one streaming pass.
+
+    Groups are kept in a hash table keyed by the GROUP BY values, so memory
+    grows with the number of groups rather than rows. Returns one dict per
+    group, in order of first appearance, keyed by aggregate_name().
+    """
+    group_by = tuple(group_by)
+    aggregates = [(func, column) for func, column in items if func is not None]
+    used = list(dict.fromkeys(
+        group_by + tuple(column for _, column in aggregates if column is not None)
+    ))
+    slots = {column: slot for slot, column in enumerate(used)}
+    key_slots = [slots[column] for column in group_by]
+    value_slots = [
+        None if column is None else slots[column] for _, column in aggregates
+    ]
+    funcs = [func for func, _ in aggregates]
+    
+    if parallel.eligible(table_data) and (
+        where_clause is None
+        or _index_candidates(table_data, where_clause, indexes) is None
+    ):
+        groups = parallel.aggregate(
+            table_data, used, where_clause, key_slots, value_slots, funcs
+        )
+    else:
+        values = _iter_values(table_data, used, where_clause, indexes)
+        groups = _accumulate(values, key_slots, value_slots, funcs)
     
-    result = []
-    for record in table_data:
-        match = True
-        for column, value in where_clause.items():
-            if column not in record or record[column] != value:
-                match = False
-                break
-        if match:
-            result.append(record)
+    if not groups and not group_by:
+        groups[()] = [_ACCUMULATORS[func]() for func, _ in aggregates]
     
-    return result
+    rows = []
+    for key, accumulators in groups.items():
+        row = dict(zip(group_by, key))
+        for (func, column), accumulator in zip(aggregates, accumulators):
+            row[aggregate_name(func, column)] = accumulator.result()
+        rows.append(row)
+    return rows, None
 
 
 @handle_db_errors
+@log_time
 def update(
     table_data: list,
     set_clause: dict,
-    where_clause: dict,
+    where_clause: tuple,
+    indexes: Optional[dict] = None,
 ) -> tuple[list, Optional[str]]:
-    """Update records in table data."""
-    for record in table_data:
-        match = True
-        for column, value in where_clause.items():
-            if column not in record or record[column] != value:
-                match = False
-                break
-        
-        if match:
-            for column, value in set_clause.items():
-                if column != "ID" and column in record:
-                    record[column] = value
+    """Update matching records in one pass.
+
+    Returns (record_id, changed_values) for every matching record; the dict
+    is empty when the record already held the new values.
+    """
+    updated = []
+    for _, record in list(_find_matches(table_data, where_clause, indexes)):
+        changed = {
+            column: value
+            for column, value in set_clause.items()
+            if column != "ID" and column in record and record[column] != value
+        }
+        if changed:
+            index.remove_record(indexes, record)
+            for column, value in changed.items():
+                record[column] = value
+            index.add_record(indexes, record)
+        updated.append((record["ID"], changed))
     
-    return table_data, None
+    return updated, None
 
 
 @confirm_action("удаление записей")
 @handle_db_errors
+@log_time
 def delete(
     table_data: list,
-    where_clause: dict,
+    where_clause: tuple,
+    indexes: Optional[dict] = None,
 ) -> tuple[list, Optional[str]]:
-    """Delete records from table data."""
-    filtered_data = []
-    for record in table_data:
-        match = True
-        for column, value in where_clause.items():
-            if column not in record or record[column] != value:
-                match = False
-                break
-        if not match:
-            filtered_data.append(record)
+    """Delete matching records in one pass and return copies of them."""
+    positions = []
+    deleted = []
+    for position, record in _find_matches(table_data, where_clause, indexes):
+        index.remove_record(indexes, record)
+        positions.append(position)
+        deleted.append(dict(record))
     
-    return filtered_data, None
+    if positions:
+        table_data.delete_positions(positions)
+    return deleted, None
 
 
 def get_table_info(
@@ -198,16 +596,474 @@ def get_table_info(
     return info
 
 
+def _record_values(row_schema: schema.RowSchema, record: dict) -> tuple:
+    """Return the values of a streamed record in column order."""
+    try:
+        values = row_schema.values(record)
+    except KeyError as e:
+        raise ValueError(f'нет значения для "{e.args[0]}".') from None
+    
+    if len(record) > len(values):
+        unknown = set(record) - set(row_schema.columns)
+        if unknown:
+            raise ValueError(f'неизвестный столбец "{sorted(unknown)[0]}".')
+    return values
+
+
+def _append_batch(
+    table_data: list,
+    batch: list,
+    indexes: Optional[dict],
+) -> None:
+    """Append built records to the table, advancing its ID sequence."""
+    for new_record in batch:
+        table_data.sequence = new_record["ID"]
+        table_data.append(new_record)
+        index.add_record(indexes, new_record)
+
+
+def _iter_values(
+    table_data: list,
+    columns: list,
+    where_clause: Optional[tuple],
+    indexes: Optional[dict],
+):
+    """Yield tuples of the given column values for matching records.
+
+    Without a WHERE clause the values come straight from the column
+    iterators, so columnar and binary tables never build row views.
+    """
+    if where_clause is not None:
+        return (
+            tuple(record[column] for column in columns)
+            for _, record in _find_matches(table_data, where_clause, indexes)
+        )
+    if not columns:
+        return repeat((), len(table_data))
+    return zip(*(table_data.column(column) for column in columns))
+
+
+def _accumulate(values, key_slots: list, value_slots: list, funcs: list) -> dict:
+    """Group value tuples by their key slots, feeding the accumulators.
+
+    Returns accumulator lists keyed by group, in order of first appearance.
+    """
+    groups = {}
+    for row in values:
+        key = tuple(row[slot] for slot in key_slots)
+        accumulators = groups.get(key)
+        if accumulators is None:
+            accumulators = [_ACCUMULATORS[func]() for func in funcs]
+            groups[key] = accumulators
+        for accumulator, slot in zip(accumulators, value_slots):
+            accumulator.add(None if slot is None else row[slot])
+    return groups
+
+
+def _merge_groups(groups: dict, partial: dict) -> None:
+    """Merge the groups accumulated over a later part of the table."""
+    for key, accumulators in partial.items():
+        current = groups.get(key)
+        if current is None:
+            groups[key] = accumulators
+            continue
+        for accumulator, other in zip(current, accumulators):
+            accumulator.merge(other)
+
+
+def _find_matches(
+    table_data: list,
+    where_clause: tuple,
+    indexes: Optional[dict] = None,
+):
+    """Yield (position, record) pairs matching the WHERE clause.
+
+    Uses an index when one narrows the candidates (see _index_candidates),
+    otherwise scans the table with the compiled predicate.
+    """
+    candidate_ids = _index_candidates(table_data, where_clause, indexes)
+    if candidate_ids is None:
+        for position in _scan(table_data, where_clause):
+            yield position, table_data[position]
+        return
+    
+    test = predicate.compile_row_predicate(where_clause)
+    for record_id in sorted(candidate_ids):
+        position = table_data.position_of(record_id)
+        if position is None:
+            continue
+        record = table_data[position]
+        if test(record):
+            yield position, record
+
+
+def _index_candidates(
+    table_data: list,
+    where_clause: tuple,
+    indexes: Optional[dict],
+):
+    """Return IDs of the possible matches of a clause, or None to scan.
+
+    Equality terms are looked up in any index. Range terms use a range of
+    IDs or a sorted index when they select at most RANGE_INDEX_MAX_SHARE
+    of the table, whichever is narrower.
+    """
+    candidate_ids = index.lookup(indexes, predicate.equality_terms(where_clause))
+    if candidate_ids is not None:
+        return candidate_ids
+    
+    bounds = predicate.range_terms(where_clause)
+    if not bounds:
+        return None
+    max_rows = int(len(table_data) * RANGE_INDEX_MAX_SHARE)
+    id_bounds = bounds.pop("ID", None)
+    if id_bounds is not None:
+        low, low_inclusive, high, high_inclusive = id_bounds
+        first = 1
+        if low is not None:
+            first = max(first, low if low_inclusive else low + 1)
+        last = table_data.sequence
+        if high is not None:
+            last = min(last, high if high_inclusive else high - 1)
+        if last - first + 1 <= max_rows:
+            candidate_ids = range(first, max(first, last + 1))
+            # A sorted index has to be narrower to be used instead.
+            max_rows = len(candidate_ids) - 1
+    
+    found = index.range_lookup(indexes, bounds, max_rows)
+    return candidate_ids if found is None else found
+
+
+def _scan(table_data: list, where_clause: tuple):
+    """Return an iterator over positions of records matching the clause.
+
+    Row lists are filtered record by record; columnar and binary tables are
+    filtered over the used columns only, without building row views. Large
+    binary tables are filtered by worker processes (see parallel.py).
+    """
+    if isinstance(table_data, list):
+        test = predicate.compile_row_predicate(where_clause)
+        return compress(table_data.positions(), map(test, table_data))
+    
+    if parallel.eligible(table_data):
+        return parallel.scan(table_data, where_clause)
+    
+    test = predicate.compile_column_predicate(where_clause)
+    columns = [
+        table_data.column(column)
+        for column in predicate.columns_of(where_clause)
+    ]
+    return compress(table_data.positions(), map(test, *columns))
+
+
+def _iter_index_order(
+    table_data: list,
+    column_index: index.SortedIndex,
+    column: str,
+    descending: bool,
+    where_clause: Optional[tuple],
+):
+    """Yield matching records in the order of a sorted index.
+
+    Range terms on the index column limit the walk to their part of the
+    index. Pairs left stale by logged updates and deletes are skipped.
+    """
+    start, stop = 0, len(column_index)
+    test = None
+    if where_clause is not None:
+        bounds = predicate.range_terms(where_clause).get(column)
+        if bounds is not None:
+            start, stop = column_index.span(*_span_args(bounds))
+        test = predicate.compile_row_predicate(where_clause)
+    
+    for value, record_id in column_index.walk(start, stop, descending):
+        position = table_data.position_of(record_id)
+        if position is None:
+            continue
+        record = table_data[position]
+        if record[column] != value:
+            continue
+        if test is None or test(record):
+            yield record
+
+
+def _span_args(bounds: tuple) -> tuple:
+    """Reorder (low, low_inclusive, high, high_inclusive) for span()."""
+    low, low_inclusive, high, high_inclusive = bounds
+    return low, high, low_inclusive, high_inclusive
+
+
+def _top_records(records, key, descending: bool, limit: int, offset: int):
+    """Yield the records of a top-k heap selection.
+
+    The heap is only filled on the first next(), so building the iterator
+    does not read the input, e.g. when a cached result is used instead.
+    """
+    select = heapq.nlargest if descending else heapq.nsmallest
+    yield from select(offset + limit, records, key=key)[offset:]
+
+
+def _merge_sorted_runs(records, key, descending: bool, run_rows: int):
+    """External merge sort: yield records sorted by key, spilling runs."""
+    records = iter(records)
+    run = sorted(islice(records, run_rows), key=key, reverse=descending)
+    if len(run) < run_rows:
+        yield from run
+        return
+    
+    # Imported here as only sorts of long inputs need it.
+    import tempfile
+    
+    spills = []
+    try:
+        while run:
+            spill = tempfile.TemporaryFile("w+", encoding="utf-8")
+            spills.append(spill)
+            spill.writelines(json.dumps(dict(record)) + "\n" for record in run)
+            spill.seek(0)
+            run = sorted(islice(records, run_rows), key=key, reverse=descending)
+        
+        runs = [map(json.loads, spill) for spill in spills]
+        yield from heapq.merge(*runs, key=key, reverse=descending)
+    finally:
+        for spill in spills:
+            spill.close()
+
+
+def _side_where(table: str, terms: list) -> Optional[tuple]:
+    """Combine the WHERE terms of one join side over its own column names."""
+    if not terms:
+        return None
+    prefix = len(table) + 1
+    names = {
+        column: column[prefix:]
+        for term in terms
+        for column in predicate.columns_of(term)
+    }
+    terms = [predicate.rename_columns(term, names) for term in terms]
+    return terms[0] if len(terms) == 1 else ("and", tuple(terms))
+
+
+def _join_records(
+    left: JoinSide,
+    left_where: Optional[tuple],
+    right: JoinSide,
+    right_where: Optional[tuple],
+):
+    """Yield joined records, choosing which side to stream and to probe."""
+    left_size = _estimate_rows(left, left_where)
+    right_size = _estimate_rows(right, right_where)
+    if _has_key_index(right) and not (
+        _has_key_index(left) and right_size < left_size
+    ):
+        stream, stream_where = left, left_where
+        probe = _index_probe(right, right_where)
+    elif _has_key_index(left):
+        stream, stream_where = right, right_where
+        probe = _index_probe(left, left_where)
+    elif left_size < right_size:
+        stream, stream_where = right, right_where
+        probe = _hash_probe(left, left_where)
+    else:
+        stream, stream_where = left, left_where
+        probe = _hash_probe(right, right_where)
+    
+    left_prefix = f"{left.table}."
+    right_prefix = f"{right.table}."
+    streamed_left = stream is left
+    for record in iter_select(stream.data, stream_where, stream.indexes):
+        for other in probe(record[stream.column]):
+            left_record, right_record = (
+                (record, other) if streamed_left else (other, record)
+            )
+            joined = {
+                left_prefix + column: value
+                for column, value in left_record.items()
+            }
+            for column, value in right_record.items():
+                joined[right_prefix + column] = value
+            yield joined
+
+
+def _has_key_index(side: JoinSide) -> bool:
+    """Check whether records of a side can be found by join value directly."""
+    return side.column == "ID" or bool(
+        side.indexes and side.column in side.indexes
+    )
+
+
+def _estimate_rows(side: JoinSide, where_clause: Optional[tuple]) -> int:
+    """Return an upper bound of the rows of a side matching its terms."""
+    if where_clause is not None:
+        candidate_ids = _index_candidates(side.data, where_clause, side.indexes)
+        if candidate_ids is not None:
+            return len(candidate_ids)
+    return len(side.data)
+
+
+def _index_probe(side: JoinSide, where_clause: Optional[tuple]):
+    """Return a function finding the matching records of a value by index."""
+    table_data = side.data
+    test = None
+    if where_clause is not None:
+        test = predicate.compile_row_predicate(where_clause)
+    column_index = None if side.column == "ID" else side.indexes[side.column]
+
+    def probe(value):
+        if column_index is not None:
+            record_ids = sorted(column_index.get(value, ()))
+        elif isinstance(value, int) and not isinstance(value, bool):
+            record_ids = (value,)
+        else:
+            return
+        for record_id in record_ids:
+            position = table_data.position_of(record_id)
+            if position is None:
+                continue
+            record = table_data[position]
+            if test is None or test(record):
+                yield record
+    
+    return probe
+
+
+def _hash_probe(side: JoinSide, where_clause: Optional[tuple]):
+    """Build a join value -> positions table over a side and return its probe."""
+    table_data = side.data
+    if where_clause is None:
+        keys = zip(table_data.positions(), table_data.column(side.column))
+    else:
+        keys = (
+            (position, record[side.column])
+            for position, record in _find_matches(
+                table_data, where_clause, side.indexes
+            )
+        )
+    
+    positions = {}
+    for position, value in keys:
+        found = positions.get(value)
+        if found is None:
+            positions[value] = [position]
+        else:
+            found.append(position)
+
+    def probe(value):
+        return [table_data[position] for position in positions.get(value, ())]
+    
+    return probe
+
+
 def _validate_value_type(value, expected_type: str) -> Optional[str]:
     """Validate that value matches expected type."""
-    if expected_type == "int":
-        if not isinstance(value, int) or isinstance(value, bool):
-            return f'Ошибка: ожидается тип int, получено {type(value).__name__}.'
-    elif expected_type == "str":
-        if not isinstance(value, str):
-            return f'Ошибка: ожидается тип str, получено {type(value).__name__}.'
-    elif expected_type == "bool":
-        if not isinstance(value, bool):
-            return f'Ошибка: ожидается тип bool, получено {type(value).__name__}.'
+    if not schema.check_value(value, expected_type):
+        return schema.type_error(value, expected_type)
     
     return None
+
+
+class _Count:
+    """COUNT accumulator."""
+
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, value) -> None:
+        self.count += 1
+
+    def merge(self, other: "_Count") -> None:
+        self.count += other.count
+
+    def result(self) -> int:
+        return self.count
+
+
+class _Sum:
+    """SUM accumulator; NULL (None) over no rows, as in SQL."""
+
+    __slots__ = ("total",)
+
+    def __init__(self):
+        self.total = None
+
+    def add(self, value) -> None:
+        self.total = value if self.total is None else self.total + value
+
+    def merge(self, other: "_Sum") -> None:
+        if other.total is not None:
+            self.add(other.total)
+
+    def result(self):
+        return self.total
+
+
+class _Min:
+    """MIN accumulator."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = None
+
+    def add(self, value) -> None:
+        if self.value is None or value < self.value:
+            self.value = value
+
+    def merge(self, other: "_Min") -> None:
+        if other.value is not None:
+            self.add(other.value)
+
+    def result(self):
+        return self.value
+
+
+class _Max:
+    """MAX accumulator."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = None
+
+    def add(self, value) -> None:
+        if self.value is None or value > self.value:
+            self.value = value
+
+    def merge(self, other: "_Max") -> None:
+        if other.value is not None:
+            self.add(other.value)
+
+    def result(self):
+        return self.value
+
+
+class _Avg:
+    """AVG accumulator."""
+
+    __slots__ = ("total", "count")
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+
+    def add(self, value) -> None:
+        self.total += value
+        self.count += 1
+
+    def merge(self, other: "_Avg") -> None:
+        self.total += other.total
+        self.count += other.count
+
+    def result(self):
+        return self.total / self.count if self.count else None
+
+
+_ACCUMULATORS = {
+    "count": _Count,
+    "sum": _Sum,
+    "min": _Min,
+    "max": _Max,
+    "avg": _Avg,
+}
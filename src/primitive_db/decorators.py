@@ -1,8 +1,13 @@
 """Decorators for database operations."""
 
+import sys
+import threading
 import time
+from collections import OrderedDict
 from functools import wraps
-from typing import Any, Callable
+from typing import Any, Callable, Optional
+
+from src.primitive_db import metrics
 
 
 def handle_db_errors(func: Callable) -> Callable:
@@ -22,13 +27,38 @@ def handle_db_errors(func: Callable) -> Callable:
     return wrapper
 
 
+_auto_confirm = False
+
+_NO_TERMINAL = "Операция отменена: нет терминала для подтверждения, используйте --yes."
+
+
+def set_auto_confirm(enabled: bool) -> None:
+    """Make confirm_action accept operations without asking."""
+    global _auto_confirm
+    _auto_confirm = enabled
+
+
 def confirm_action(action_name: str) -> Callable:
-    """Decorator factory for requesting user confirmation."""
+    """Decorator factory for requesting user confirmation.
+
+    Answers are only read from a terminal: when stdin is a pipe or a file
+    (e.g. `--script -`) or ends, the operation is cancelled instead of
+    taking the next input line as the answer.
+    """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs):
-            confirm = input(f'Вы уверены, что хотите выполнить "{action_name}"?'
-                            f' [y/n]: ').strip().lower()
+            if _auto_confirm:
+                return func(*args, **kwargs)
+            if not sys.stdin.isatty():
+                return None, _NO_TERMINAL
+            try:
+                confirm = input(
+                    f'Вы уверены, что хотите выполнить "{action_name}"?'
+                    f' [y/n]: '
+                ).strip().lower()
+            except EOFError:
+                return None, _NO_TERMINAL
             if confirm != 'y':
                 return None, "Операция отменена."
             return func(*args, **kwargs)
@@ -37,28 +67,90 @@ def confirm_action(action_name: str) -> Callable:
 
 
 def log_time(func: Callable) -> Callable:
-    """Decorator to measure and log function execution time."""
+    """Decorator recording function execution time in the metrics registry.
+
+    Times go to the "execute.<function>" timer and are only measured while
+    metrics collection is on (see the stats command).
+    """
+    name = f"execute.{func.__name__}"
+    
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start = time.monotonic()
-        result = func(*args, **kwargs)
-        end = time.monotonic()
-        elapsed = end - start
-        print(f"Функция {func.__name__} выполнилась за {elapsed:.3f} секунд.")
-        return result
+        if not metrics.enabled():
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics.observe(name, time.perf_counter() - start)
     return wrapper
 
 
-def create_cacher():
-    """Factory function that returns a caching function using closure."""
-    cache = {}
+_MISSING = object()
+
+
+def create_cacher(
+    max_entries: int = 128,
+    max_size: Optional[int] = None,
+    sizeof: Callable = len,
+):
+    """Factory function that returns a caching function using closure.
+
+    At most `max_entries` results are kept, and with `max_size` also no more
+    than that total `sizeof(result)`; the least recently used results are
+    evicted first. A result larger than `max_size` is returned uncached.
+    The returned function has get(key, default) and put(key, result)
+    attributes for callers that produce a result incrementally, and clear()
+    to drop everything.
+    """
+    cache = OrderedDict()
+    sizes = {}
+    total = 0
+    lock = threading.Lock()
+    
+    def get(key, default=None) -> Any:
+        """Return a cached result, or `default` if there is none."""
+        with lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+        return default
     
-    def cache_result(key: str, value_func: Callable) -> Any:
+    def put(key, result) -> None:
+        """Cache a result, evicting the least recently used ones."""
+        nonlocal total
+        size = sizeof(result) if max_size is not None else 0
+        if max_size is not None and size > max_size:
+            return
+        
+        with lock:
+            if key not in cache:
+                cache[key] = result
+                sizes[key] = size
+                total += size
+            while len(cache) > max_entries or (
+                max_size is not None and total > max_size
+            ):
+                old_key, _ = cache.popitem(last=False)
+                total -= sizes.pop(old_key)
+    
+    def cache_result(key, value_func: Callable) -> Any:
         """Cache result based on key. If not in cache, compute using value_func."""
-        if key in cache:
-            return cache[key]
-        result = value_func()
-        cache[key] = result
+        result = get(key, _MISSING)
+        if result is _MISSING:
+            result = value_func()
+            put(key, result)
         return result
     
+    def clear() -> None:
+        """Drop all cached results."""
+        nonlocal total
+        with lock:
+            cache.clear()
+            sizes.clear()
+            total = 0
+    
+    cache_result.get = get
+    cache_result.put = put
+    cache_result.clear = clear
     return cache_result
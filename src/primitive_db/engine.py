@@ -1,15 +1,70 @@
 """Engine module for command processing and user interaction."""
 
-import shlex
+import csv
+import json
+import sys
+import time
+from itertools import islice
 
-from prettytable import PrettyTable
+from src.primitive_db import core, metrics, parser, predicate
+from src.primitive_db.cache import TableCache
+from src.primitive_db.constants import QUERY_CACHE_MAX_ROWS, RENDER_PAGE_SIZE
+from src.primitive_db.utils import STORAGES, iter_file_records, save_table_data
 
-from src.primitive_db import core, parser
-from src.primitive_db.utils import (
-    load_metadata,
-    load_table_data,
-    save_table_data,
+# Commands reading or changing one table; they run under a shared or
+# exclusive file lock on it.
+_READ_COMMANDS = ("select", "info")
+_WRITE_COMMANDS = (
+    "create_table",
+    "drop_table",
+    "create_index",
+    "compact",
+    "convert",
+    "insert",
+    "load",
+    "update",
+    "delete",
 )
+_SCHEMA_COMMANDS = ("create_table", "drop_table")
+
+# Messages for malformed commands: by the clause that failed to parse,
+# otherwise the syntax of the command.
+_ERRORS = {
+    "values": "Ошибка: некорректный формат значений.",
+    "set": "Ошибка: некорректный формат SET или WHERE",
+    "no_where": "Ошибка: требуется условие WHERE",
+    "where": "Ошибка: некорректное условие WHERE. Формат: column"
+             " <op> value [and|or ...], op: = != < <= > >=",
+    "items": "Ошибка: некорректный список столбцов. Формат: <столбец>,"
+             " count(*), count|sum|min|max|avg(<столбец>)",
+    "join": "Ошибка: некорректный join. Формат: select from <таблица> join"
+            " <таблица> on <таблица>.<столбец> = <таблица>.<столбец>",
+    "group_by": "Ошибка: некорректный group by. Формат: select <столбцы и"
+                " агрегаты> from <таблица> group by <столбец>, ...",
+    "order_by": "Ошибка: некорректный order by. Формат: order by <столбец>"
+                " [asc|desc]",
+    "options": "Ошибка: некорректные параметры. Формат: limit <n> offset <n>"
+               " format table|csv|jsonl",
+}
+_USAGE = {
+    "create_table": "Синтаксис: create_table <имя_таблицы> <столбец1:тип> ...",
+    "drop_table": "Синтаксис: drop_table <имя_таблицы>",
+    "create_index": "Синтаксис: create_index <имя_таблицы> <столбец>"
+                    " [hash|sorted]",
+    "info": "Функция info требует имя таблицы. Попробуйте снова.",
+    "compact": "Синтаксис: compact <имя_таблицы>",
+    "convert": f"Синтаксис: convert <имя_таблицы> <{'|'.join(STORAGES)}>",
+    "insert": "Синтаксис: insert into <таблица> values (<значение1>,"
+              " <значение2>, ...)",
+    "load": "Синтаксис: load <таблица> from <файл.csv|файл.jsonl>",
+    "select": "Синтаксис: select [<столбцы и агрегаты>] from <таблица>"
+              " [join <таблица> on <столбец> = <столбец>] [where условие]"
+              " [group by <столбцы>] [order by <столбец> [asc|desc]]"
+              " [limit <n>] [offset <n>] [format table|csv|jsonl]",
+    "update": "Синтаксис: update <таблица> set <столбец> = <значение>"
+              " where <условие>",
+    "delete": "Синтаксис: delete from <таблица> where <условие>",
+}
 
 
 def print_help() -> None:
@@ -22,6 +77,14 @@ def print_help() -> None:
     )
     print("<command> list_tables - показать все таблицы")
     print("<command> drop_table <имя_таблицы> - удалить таблицу")
+    print(
+        "<command> create_index <имя_таблицы> <столбец> - создать индекс "
+        "для условий вида <столбец> = <значение>"
+    )
+    print(
+        "<command> create_index <имя_таблицы> <столбец> sorted - создать "
+        "упорядоченный индекс для условий <, <=, >, >=, between и order by"
+    )
     
     print("\n***Операции с данными***")
     print("Функции:")
@@ -31,21 +94,50 @@ def print_help() -> None:
     )
     print(
         "<command> select from <имя_таблицы> [where "
-        "<столбец> = <значение>] - прочитать записи"
+        "<условие>] [order by <столбец> [asc|desc]] [limit <n>] [offset <n>] "
+        "[format table|csv|jsonl] - прочитать записи"
+    )
+    print(
+        "<command> select <столбцы>, count(*), sum|min|max|avg(<столбец>) "
+        "from <имя_таблицы> [where <условие>] [group by <столбцы>] - "
+        "агрегатные значения"
+    )
+    print(
+        "<command> select from <имя_таблицы> join <имя_таблицы> on "
+        "<таблица>.<столбец> = <таблица>.<столбец> [where <условие>] ... - "
+        "соединить две таблицы"
     )
     print(
         "<command> update <имя_таблицы> set <столбец> = "
-        "<значение> where <столбец> = <значение> - обновить запись"
+        "<значение> where <условие> - обновить запись"
     )
     print(
         "<command> delete from <имя_таблицы> where "
-        "<столбец> = <значение> - удалить запись"
+        "<условие> - удалить запись"
+    )
+    print(
+        "<command> load <имя_таблицы> from <файл.csv|файл.jsonl> - загрузить "
+        "записи из файла"
     )
     print("<command> info <имя_таблицы> - вывести информацию о таблице")
+    print("<command> compact <имя_таблицы> - сжать журнал изменений таблицы")
+    print(
+        "<command> convert <имя_таблицы> <segments|json|binary> - "
+        "сменить формат хранения таблицы"
+    )
     
     print("\n***Общие команды***")
     print("<command> exit - выход из программы")
-    print("<command> help - справочная информация\n")
+    print("<command> help - справочная информация")
+    print(
+        "<command> stats [on|off|reset|dump <файл>|profile <каталог>|"
+        "profile off] - метрики производительности"
+    )
+    print(
+        "\n<условие>: <столбец> <оп> <значение>, оп: = != < <= > >=, или "
+        "<столбец> between <от> and <до>; условия объединяются and, or, not "
+        "и скобками\n"
+    )
 
 
 def run() -> None:
@@ -53,9 +145,9 @@ def run() -> None:
     print("\n***База данных***\n")
     print_help()
     
+    cache = TableCache()
+    
     while True:
-        metadata = load_metadata(core.METADATA_FILE)
-        
         try:
             user_input = input(">>>Введите команду: ").strip()
         except EOFError:
@@ -66,271 +158,660 @@ def run() -> None:
             continue
         
         try:
-            args = shlex.split(user_input)
-        except ValueError:
-            print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-            continue
+            if not execute_command(user_input, cache):
+                break
+        except ValueError as e:
+            print(f"Ошибка: {e}")
+
+
+def run_script(path: str, flush_every: int = 0) -> None:
+    """Execute commands from a file ("-" for stdin) without prompts.
+
+    Table changes are kept in memory and written as one group commit at the
+    end, or every `flush_every` commands when it is positive. Empty lines
+    and lines starting with "--" or "#" are skipped.
+    """
+    cache = TableCache(autoflush=False)
+    source = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    executed = 0
+    
+    try:
+        for line in source:
+            user_input = line.strip()
+            if not user_input or user_input.startswith(("--", "#")):
+                continue
+            
+            try:
+                if not execute_command(user_input, cache):
+                    break
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+            
+            executed += 1
+            if flush_every > 0 and executed % flush_every == 0:
+                cache.flush()
+    finally:
+        cache.flush()
+        if source is not sys.stdin:
+            source.close()
+
+
+def run_command(user_input: str) -> None:
+    """Execute a single command without prompts or the banner.
+
+    Only the metadata and the table the command names are read.
+    """
+    cache = TableCache()
+    try:
+        execute_command(user_input, cache)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+    finally:
+        cache.flush()
+
+
+def execute_command(user_input: str, cache: TableCache) -> bool:
+    """Execute one command. Return False when the session should end."""
+    start = time.perf_counter()
+    if not user_input.strip():
+        return True
+    
+    with metrics.phase("parse"):
+        statement = parser.parse_statement(user_input)
+    if statement is None:
+        print(f"Некорректное значение: {user_input}. Попробуйте снова.")
+        return True
+    
+    command = statement.command
+    table_names = []
+    if command in _READ_COMMANDS or command in _WRITE_COMMANDS:
+        table_names.append(statement.table)
+        if statement.join is not None:
+            table_names.append(statement.join[0])
+    table_names = [
+        name for name in table_names if name is not None and name.isidentifier()
+    ]
+    
+    profile_name = command if command.isidentifier() else "command"
+    try:
+        with metrics.profiled(profile_name), cache.locked(
+            table_names,
+            exclusive=command in _WRITE_COMMANDS,
+            schema=command in _SCHEMA_COMMANDS,
+        ):
+            return _dispatch(statement, cache)
+    finally:
+        metrics.observe(f"command.{profile_name}", time.perf_counter() - start)
+
+
+def _dispatch(statement: parser.Statement, cache: TableCache) -> bool:
+    """Run a parsed command. Return False when the session should end."""
+    command = statement.command
+    table_name = statement.table
+    if statement.error is not None:
+        print(_ERRORS.get(statement.error) or _USAGE[command])
+        return True
+    
+    metadata = cache.metadata()
+    
+    if command == "exit":
+        print("До свидания!")
+        return False
+    
+    elif command == "help":
+        print_help()
+    
+    elif command == "stats":
+        _stats_command(statement.args)
+    
+    elif command == "create_table":
+        error = core.create_table(metadata, table_name, list(statement.args))
+        if error:
+            print(error)
+        else:
+            col_display = ", ".join(
+                f"{k}:{v}" for k, v in metadata[table_name].items()
+            )
+            print(f'Таблица "{table_name}" успешно создана со столбцами:'
+                  f' {col_display}')
+    
+    elif command == "list_tables":
+        tables = list(metadata.keys())
+        if not tables:
+            print("Нет таблиц.")
+        else:
+            for table_name in tables:
+                print(f"- {table_name}")
+    
+    elif command == "drop_table":
+        result = core.drop_table(metadata, table_name)
+        cache.invalidate(table_name)
+        if isinstance(result, tuple):
+            _, error = result
+            if error:
+                print(error)
+            else:
+                print(f'Таблица "{table_name}" успешно удалена.')
+        elif result:
+            print(result)
+        else:
+            print(f'Таблица "{table_name}" успешно удалена.')
+    
+    elif command == "create_index":
+        column, kind = statement.args
+        if kind not in ("hash", "sorted"):
+            print(_USAGE[command])
+            return True
         
-        if not args:
-            continue
+        table_data = cache.table(table_name)
+        indexes = cache.indexes(table_name)
+        error = core.create_index(
+            metadata, table_name, column, table_data, indexes, kind
+        )
+        if error:
+            print(error)
+        else:
+            cache.touch(table_name)
+            name = "Упорядоченный индекс" if kind == "sorted" else "Индекс"
+            print(f'{name} по столбцу "{column}" таблицы "{table_name}"'
+                  f' успешно создан.')
+    
+    elif command == "info":
+        table_data = cache.table(table_name)
+        info = core.get_table_info(metadata, table_name, table_data)
         
-        command = args[0].lower()
+        if info is None:
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+        else:
+            print(info)
+    
+    elif command == "compact":
+        if table_name not in metadata:
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
         
-        if command == "exit":
-            print("До свидания!")
-            break
+        cache.flush()
+        table_data = cache.table(table_name)
+        indexes = cache.indexes(table_name)
+        with metrics.phase("save"):
+            save_table_data(
+                table_name, table_data, cache.data_dir, indexes=indexes
+            )
+        cache.touch(table_name)
+        record_count = len(table_data)
+        print(f'Таблица "{table_name}" сжата, записей: {record_count}.')
+    
+    elif command == "convert":
+        storage = statement.args[0]
+        if storage not in STORAGES:
+            print(_USAGE[command])
+            return True
         
-        elif command == "help":
-            print_help()
+        if table_name not in metadata:
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
         
-        elif command == "create_table":
-            if len(args) < 3:
-                print("Синтаксис: create_table <имя_таблицы> <столбец1:тип> ...")
-                continue
-            
-            table_name = args[1]
-            columns_str = args[2:]
-            
-            error = core.create_table(metadata, table_name, columns_str)
+        cache.flush()
+        table_data = cache.table(table_name)
+        with metrics.phase("save"):
+            save_table_data(
+                table_name,
+                table_data,
+                cache.data_dir,
+                storage=storage,
+                columns=metadata[table_name],
+            )
+        cache.invalidate(table_name)
+        print(f'Таблица "{table_name}" переведена в формат {storage}.')
+    
+    elif command == "insert":
+        table_data = cache.table(table_name)
+        indexes = cache.indexes(table_name)
+        result = core.insert(
+            metadata, table_name, list(statement.values), table_data, indexes
+        )
+        
+        if isinstance(result, tuple):
+            table_data, error = result
             if error:
                 print(error)
             else:
-                col_display = ", ".join(
-                    f"{k}:{v}" for k, v in metadata[table_name].items()
+                new_record = dict(table_data[-1])
+                print(f'Запись с ID={new_record["ID"]} успешно добавлена в'
+                      f' таблицу "{table_name}".')
+                cache.commit(
+                    table_name, [{"op": "insert", "record": new_record}]
                 )
-                print(f'Таблица "{table_name}" успешно создана со столбцами:'
-                      f' {col_display}')
+    
+    elif command == "load":
+        if table_name not in metadata:
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
         
-        elif command == "list_tables":
-            tables = list(metadata.keys())
-            if not tables:
-                print("Нет таблиц.")
-            else:
-                for table_name in tables:
-                    print(f"- {table_name}")
+        cache.flush()
+        table_data = cache.table(table_name)
+        indexes = cache.indexes(table_name)
+        records = iter_file_records(statement.args[0], metadata[table_name])
+        result = core.insert_many(
+            metadata, table_name, records, table_data, indexes
+        )
         
-        elif command == "drop_table":
-            if len(args) < 2:
-                print("Синтаксис: drop_table <имя_таблицы>")
-                continue
-            
-            table_name = args[1]
-            result = core.drop_table(metadata, table_name)
-            if isinstance(result, tuple):
-                _, error = result
-                if error:
-                    print(error)
-                else:
-                    print(f'Таблица "{table_name}" успешно удалена.')
-            elif result:
-                print(result)
+        if isinstance(result, tuple):
+            count, error = result
+            if error:
+                print(error)
             else:
-                print(f'Таблица "{table_name}" успешно удалена.')
+                with metrics.phase("save"):
+                    save_table_data(
+                        table_name, table_data, cache.data_dir, indexes=indexes
+                    )
+                cache.touch(table_name)
+                print(f'Загружено записей в таблицу "{table_name}": {count}.')
+    
+    elif command == "select":
+        if statement.join is None:
+            _select_command(statement, metadata, cache)
+        else:
+            _join_command(statement, metadata, cache)
+    
+    elif command == "update":
+        if table_name not in metadata:
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
         
-        elif command == "info":
-            if len(args) < 2:
-                print("Функция info требует имя таблицы. Попробуйте снова.")
-                continue
-            
-            table_name = args[1]
-            table_data = load_table_data(table_name)
-            info = core.get_table_info(metadata, table_name, table_data)
-            
-            if info is None:
-                print(f'Ошибка: Таблица "{table_name}" не существует.')
+        where_clause = statement.where
+        set_clause = dict(statement.assignments)
+        error = core.validate_set_clause(
+            set_clause, metadata[table_name]
+        ) or core.validate_where_clause(where_clause, metadata[table_name])
+        if error:
+            print(error)
+            return True
+        
+        table_data = cache.table(table_name)
+        indexes = cache.indexes(table_name)
+        result = core.update(table_data, set_clause, where_clause, indexes)
+        
+        if isinstance(result, tuple):
+            updated, error = result
+            if error:
+                print(error)
             else:
-                print(info)
+                entries = []
+                for record_id, changed in updated:
+                    print(f'Запись с ID={record_id} в таблице "{table_name}"'
+                          f' успешно обновлена.')
+                    if changed:
+                        entries.append(
+                            {"op": "update", "id": record_id, "values": changed}
+                        )
+                cache.commit(table_name, entries)
+    
+    elif command == "delete":
+        if table_name not in metadata:
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
         
-        elif command == "insert":
-            if len(args) < 4 or args[1].lower() != "into":
-                print("Синтаксис: insert into <таблица> values (<значение1>,"
-                      " <значение2>, ...)")
-                continue
-            
-            table_name = args[2]
-            
-            if args[3].lower() != "values":
-                print("Синтаксис: insert into <таблица> values (<значение1>,"
-                      " <значение2>, ...)")
-                continue
-            
-            values_str = " ".join(args[4:])
-            values = _parse_values(values_str)
-            
-            if values is None:
-                print("Ошибка: некорректный формат значений.")
-                continue
-            
-            table_data = load_table_data(table_name)
-            result = core.insert(metadata, table_name, values, table_data)
-            
-            if isinstance(result, tuple):
-                table_data, error = result
-                if error:
-                    print(error)
-                else:
-                    last_id = table_data[-1]["ID"]
-                    print(f'Запись с ID={last_id} успешно добавлена в таблицу'
-                          f' "{table_name}".')
-                    save_table_data(table_name, table_data)
+        where_clause = statement.where
+        error = core.validate_where_clause(where_clause, metadata[table_name])
+        if error:
+            print(error)
+            return True
         
-        elif command == "select":
-            if len(args) < 3 or args[1].lower() != "from":
-                print("Синтаксис: select from <таблица> [where условие]")
-                continue
-            
-            table_name = args[2]
-            where_clause = None
-            
-            if len(args) > 3 and args[3].lower() == "where":
-                where_str = " ".join(args[4:])
-                where_clause = parser.parse_where_clause(where_str)
-                
-                if where_clause is None:
-                    print("Ошибка: некорректное условие WHERE. Формат: column"
-                          " = value")
-                    continue
-            
-            if table_name not in metadata:
-                print(f'Ошибка: Таблица "{table_name}" не существует.')
-                continue
-            
-            table_data = load_table_data(table_name)
-            result = core.select(table_data, where_clause)
-            
-            if isinstance(result, tuple):
-                selected, error = result
-                if error:
-                    print(error)
-                else:
-                    _print_table(metadata[table_name], selected)
+        table_data = cache.table(table_name)
+        indexes = cache.indexes(table_name)
+        result = core.delete(table_data, where_clause, indexes)
+        
+        if isinstance(result, tuple):
+            deleted, error = result
+            if error:
+                print(error)
             else:
-                _print_table(metadata[table_name], result)
+                entries = []
+                for record in deleted:
+                    print(f'Запись с ID={record["ID"]} успешно удалена из'
+                          f' таблицы "{table_name}".')
+                    entries.append({"op": "delete", "id": record["ID"]})
+                cache.commit(table_name, entries)
+    
+    else:
+        print(f"Функции {command} нет. Попробуйте снова.")
+    
+    return True
+
+
+def _select_command(
+    statement: parser.Statement,
+    metadata: dict,
+    cache: TableCache,
+) -> None:
+    """Run a select of records or aggregates and print the result."""
+    table_name = statement.table
+    where_clause = statement.where
+    items = statement.items
+    group_by = statement.group_by
+    
+    if table_name not in metadata:
+        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        return
+    
+    table_columns = metadata[table_name]
+    if where_clause is not None:
+        error = core.validate_where_clause(where_clause, table_columns)
+        if error:
+            print(error)
+            return
+    
+    table_data = cache.table(table_name)
+    indexes = cache.indexes(table_name)
+    key = (
+        table_name,
+        cache.version(table_name),
+        None if where_clause is None else predicate.normalize(where_clause),
+        items,
+        group_by,
+        statement.order_by,
+        statement.limit,
+        statement.offset,
+    )
+    if items is None:
+        output_columns = table_columns
+        if statement.order_by is not None:
+            error = core.validate_order_by(statement.order_by, output_columns)
+            if error:
+                print(error)
+                return
         
-        elif command == "update":
-            if len(args) < 4:
-                print("Синтаксис: update <таблица> set <столбец> = <значение>"
-                      " where <условие>")
-                continue
-            
-            table_name = args[1]
-            
-            if args[2].lower() != "set":
-                print("Синтаксис: update <таблица> set <столбец> = <значение>"
-                      " where <условие>")
-                continue
-            
-            where_idx = None
-            for i, arg in enumerate(args):
-                if arg.lower() == "where":
-                    where_idx = i
-                    break
-            
-            if where_idx is None:
-                print("Ошибка: требуется условие WHERE")
-                continue
-            
-            set_str = " ".join(args[3:where_idx])
-            where_str = " ".join(args[where_idx + 1:])
-            
-            set_clause = parser.parse_set_clause(set_str)
-            where_clause = parser.parse_where_clause(where_str)
-            
-            if set_clause is None or where_clause is None:
-                print("Ошибка: некорректный формат SET или WHERE")
-                continue
-            
-            if table_name not in metadata:
-                print(f'Ошибка: Таблица "{table_name}" не существует.')
-                continue
-            
-            table_data = load_table_data(table_name)
-            result = core.update(table_data, set_clause, where_clause)
-            
-            if isinstance(result, tuple):
-                table_data, error = result
-                if error:
-                    print(error)
-                else:
-                    matching = core.select(table_data, where_clause)
-                    if isinstance(matching, tuple):
-                        matching, _ = matching
-                    for record in matching:
-                        print(f'Запись с ID={record["ID"]} в таблице "{table_name}"'
-                              f' успешно обновлена.')
-                    save_table_data(table_name, table_data)
+        if statement.order_by is None:
+            records = core.iter_select(
+                table_data,
+                where_clause,
+                indexes,
+                statement.limit,
+                statement.offset,
+            )
+        else:
+            (_, column), descending = statement.order_by
+            records = core.iter_select_ordered(
+                table_data,
+                column,
+                descending,
+                where_clause,
+                indexes,
+                statement.limit,
+                statement.offset,
+            )
+        limit = statement.limit
+        if limit is not None and limit <= QUERY_CACHE_MAX_ROWS:
+            cached = cache.query_results.get(key)
+            if cached is None:
+                records = _caching(records, cache, key)
+            else:
+                records, _ = cached
+    else:
+        error = core.validate_aggregates(items, group_by, table_columns)
+        if error:
+            print(error)
+            return
         
-        elif command == "delete":
-            if len(args) < 4 or args[1].lower() != "from":
-                print("Синтаксис: delete from <таблица> where <условие>")
-                continue
-            
-            table_name = args[2]
-            
-            if args[3].lower() != "where":
-                print("Синтаксис: delete from <таблица> where <условие>")
-                continue
-            
-            where_str = " ".join(args[4:])
-            where_clause = parser.parse_where_clause(where_str)
-            
-            if where_clause is None:
-                print("Ошибка: некорректное условие WHERE")
-                continue
-            
-            if table_name not in metadata:
-                print(f'Ошибка: Таблица "{table_name}" не существует.')
-                continue
-            
-            table_data = load_table_data(table_name)
-            to_delete = core.select(table_data, where_clause)
-            if isinstance(to_delete, tuple):
-                to_delete, _ = to_delete
-            
-            result = core.delete(table_data, where_clause)
-            
-            if isinstance(result, tuple):
-                table_data, error = result
-                if error:
-                    print(error)
-                else:
-                    for record in to_delete:
-                        print(f'Запись с ID={record["ID"]} успешно удалена из'
-                              f' таблицы "{table_name}".')
-                    save_table_data(table_name, table_data)
+        output_columns = {
+            core.aggregate_name(func, column): column for func, column in items
+        }
+        if statement.order_by is not None:
+            error = core.validate_order_by(statement.order_by, output_columns)
+            if error:
+                print(error)
+                return
         
+        rows, error = cache.query_results(
+            key,
+            lambda: core.aggregate(
+                table_data, items, group_by, where_clause, indexes
+            ),
+        )
+        if error:
+            print(error)
+            return
+        
+        if statement.order_by is not None:
+            records = _ordered(statement, rows)
         else:
-            print(f"Функции {command} нет. Попробуйте снова.")
+            stop = None
+            if statement.limit is not None:
+                stop = statement.offset + statement.limit
+            records = islice(rows, statement.offset, stop)
+    
+    _print_records(statement.output_format, output_columns, records)
 
 
-def _parse_values(values_str: str):
-    """Parse values from string like '(val1, val2, val3)'."""
-    values_str = values_str.strip()
-    if values_str.startswith("(") and values_str.endswith(")"):
-        values_str = values_str[1:-1]
+def _join_command(
+    statement: parser.Statement,
+    metadata: dict,
+    cache: TableCache,
+) -> None:
+    """Run a select over two joined tables and print the result."""
+    table_name = statement.table
+    right_table = statement.join[0]
+    order_column = None
+    if statement.order_by is not None:
+        order_column = core.aggregate_name(*statement.order_by[0])
+    resolved, error = core.resolve_join(
+        metadata, table_name, statement.join, statement.where, order_column
+    )
+    if error:
+        print(error)
+        return
     
-    parts = parser._split_by_comma(values_str)
+    left_column, right_column, where_clause, order_column = resolved
+    ordered = order_column is not None
+    records = core.iter_join(
+        core.JoinSide(
+            table_name,
+            cache.table(table_name),
+            left_column,
+            cache.indexes(table_name),
+        ),
+        core.JoinSide(
+            right_table,
+            cache.table(right_table),
+            right_column,
+            cache.indexes(right_table),
+        ),
+        where_clause,
+        None if ordered else statement.limit,
+        0 if ordered else statement.offset,
+    )
+    if ordered:
+        records = core.iter_ordered(
+            records,
+            order_column,
+            statement.order_by[1],
+            statement.limit,
+            statement.offset,
+        )
+    output_columns = core.join_columns(metadata, table_name, right_table)
+    _print_records(statement.output_format, output_columns, records)
+
+
+def _ordered(statement: parser.Statement, records):
+    """Order selected records by the ORDER BY item, applying limit/offset."""
+    (func, column), descending = statement.order_by
+    return core.iter_ordered(
+        records,
+        core.aggregate_name(func, column),
+        descending,
+        statement.limit,
+        statement.offset,
+    )
+
+
+def _caching(records, cache: TableCache, key: tuple):
+    """Stream records while collecting them for the query result cache.
+
+    Output starts with the first match; the rows are cached only once the
+    result has been read to the end.
+    """
+    rows = []
+    for record in records:
+        row = dict(record)
+        rows.append(row)
+        yield row
+    cache.query_results.put(key, (rows, None))
+
+
+def _print_records(output_format: str, columns_dict: dict, records) -> None:
+    """Print records in the requested output format.
+
+    Selects are lazy, so the scan runs while the records are printed. With
+    metrics on, the time spent getting records goes to phase.scan and the
+    rest to phase.render; output stays streamed either way.
+    """
+    if output_format == "csv":
+        print_records = _print_csv
+    elif output_format == "jsonl":
+        print_records = _print_jsonl
+    else:
+        print_records = _print_table
     
-    if not parts:
-        return None
+    if not metrics.enabled():
+        print_records(columns_dict, records)
+        return
     
-    values = []
-    for part in parts:
-        value = parser._convert_value(part)
-        values.append(value)
+    records = metrics.TimedIterator(records)
+    start = time.perf_counter()
+    try:
+        print_records(columns_dict, records)
+    finally:
+        metrics.observe("phase.scan", records.seconds)
+        metrics.observe(
+            "phase.render", time.perf_counter() - start - records.seconds
+        )
+
+
+def _stats_command(args: tuple) -> None:
+    """Handle stats [on|off|reset|dump <файл>|profile <каталог>|profile off]."""
+    action = args[0].lower() if args else "show"
+    if action == "on":
+        metrics.enable(True)
+        print("Сбор метрик включен.")
+    elif action == "off":
+        metrics.enable(False)
+        print("Сбор метрик выключен.")
+    elif action == "reset":
+        metrics.registry.reset()
+        print("Метрики сброшены.")
+    elif action == "dump" and len(args) == 2:
+        try:
+            metrics.dump(args[1])
+        except OSError as e:
+            print(f"Ошибка: не удалось записать метрики в {args[1]}: {e}")
+            return
+        print(f"Метрики записаны в {args[1]}.")
+    elif action == "profile" and len(args) == 2:
+        target = args[1]
+        try:
+            metrics.set_profile_dir(None if target.lower() == "off" else target)
+        except OSError as e:
+            print(f"Ошибка: не удалось создать каталог {target}: {e}")
+            return
+        if target.lower() == "off":
+            print("Профилирование выключено.")
+        else:
+            print(f"Профили команд будут записываться в {target}.")
+    elif action == "show":
+        _print_stats()
+    else:
+        print(
+            "Синтаксис: stats [on|off|reset|dump <файл>|profile <каталог>|"
+            "profile off]"
+        )
+
+
+def _print_stats() -> None:
+    """Print collected timers (in milliseconds) and row counters."""
+    if not metrics.enabled():
+        print("Сбор метрик выключен. Включите его командой: stats on")
+        return
     
-    return values
+    snapshot = metrics.registry.snapshot()
+    rows = [
+        [
+            name,
+            timer["count"],
+            f"{timer['total'] * 1000:.3f}",
+            f"{timer['total'] * 1000 / timer['count']:.3f}",
+            f"{timer['p50'] * 1000:.3f}",
+            f"{timer['p95'] * 1000:.3f}",
+            f"{timer['max'] * 1000:.3f}",
+        ]
+        for name, timer in snapshot["timers"].items()
+    ]
+    _print_page(
+        ["метрика", "число", "всего мс", "среднее мс", "p50 мс", "p95 мс",
+         "макс мс"],
+        rows,
+    )
+    if snapshot["counters"]:
+        _print_page(["счетчик", "значение"], list(snapshot["counters"].items()))
 
 
-def _print_table(columns_dict: dict, records: list) -> None:
-    """Print records as a formatted table using PrettyTable."""
-    table = PrettyTable()
-    table.field_names = list(columns_dict.keys())
+def _print_table(columns_dict: dict, records) -> None:
+    """Print records as formatted tables, one per RENDER_PAGE_SIZE rows.
+
+    Pages are printed as soon as they fill up, so output starts before the
+    scan ends and only one page is held in memory.
+    """
+    columns = list(columns_dict.keys())
+    page = []
+    printed = False
+    rendered = 0
     
     for record in records:
-        row = [record.get(col, "") for col in columns_dict.keys()]
-        table.add_row(row)
+        page.append([record.get(col, "") for col in columns])
+        if len(page) >= RENDER_PAGE_SIZE:
+            _print_page(columns, page)
+            rendered += len(page)
+            page = []
+            printed = True
+    
+    if page or not printed:
+        _print_page(columns, page)
+        rendered += len(page)
+    metrics.count("rendered", rendered)
+
+
+def _print_page(columns: list, rows: list) -> None:
+    """Print one page of rows using PrettyTable."""
+    # Imported here so that commands printing no tables start faster.
+    from prettytable import PrettyTable
+    
+    table = PrettyTable()
+    table.field_names = columns
+    table.add_rows(rows)
     
     print()
     print(table)
     print()
+
+
+def _print_csv(columns_dict: dict, records) -> None:
+    """Stream records to stdout as CSV with a header row."""
+    columns = list(columns_dict.keys())
+    writer = csv.writer(sys.stdout)
+    writer.writerow(columns)
+    rendered = 0
+    for record in records:
+        writer.writerow([record.get(col, "") for col in columns])
+        rendered += 1
+    metrics.count("rendered", rendered)
+
+
+def _print_jsonl(columns_dict: dict, records) -> None:
+    """Stream records to stdout as JSON lines."""
+    columns = list(columns_dict.keys())
+    rendered = 0
+    for record in records:
+        row = {col: record.get(col) for col in columns}
+        sys.stdout.write(json.dumps(row, ensure_ascii=False) + "\n")
+        rendered += 1
+    metrics.count("rendered", rendered)
@@ -0,0 +1,226 @@
+"""Table indexes: hash indexes mapping column values to record IDs, and
+sorted indexes of (value, ID) pairs for range scans and ordered output."""
+
+import threading
+from bisect import bisect_left
+from typing import Optional
+
+# Sorts after every record ID, so (value, _AFTER) bounds all pairs of value.
+_AFTER = float("inf")
+
+
+class SortedIndex:
+    """Ordered index: (value, ID) pairs kept sorted and searched by bisect.
+
+    Added pairs are buffered and merged in on the next read, so bulk loads
+    cost one sort instead of an insertion each. Concurrent readers may
+    trigger the merge together; it runs once under a lock and publishes a
+    new list, so no reader sees a half-merged one. get() answers equality
+    lookups like a hash index does.
+    """
+
+    def __init__(self, pairs=()):
+        self._pairs = sorted(set(pairs))
+        self._pending = []
+        self._merge_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.pairs())
+
+    def pairs(self) -> list:
+        """Return all (value, ID) pairs in order."""
+        if self._pending:
+            with self._merge_lock:
+                if self._pending:
+                    pairs = self._pairs
+                    # Log replay may add pairs the snapshot already holds.
+                    added = [
+                        pair
+                        for pair in set(self._pending)
+                        if not _contains(pairs, pair)
+                    ]
+                    if added:
+                        # Two sorted runs: the sort is a linear merge.
+                        added.sort()
+                        self._pairs = sorted(pairs + added)
+                    self._pending = []
+        return self._pairs
+
+    def add(self, value, record_id: int) -> None:
+        self._pending.append((value, record_id))
+
+    def discard(self, value, record_id: int) -> None:
+        pairs = self.pairs()
+        position = bisect_left(pairs, (value, record_id))
+        if position < len(pairs) and pairs[position] == (value, record_id):
+            del pairs[position]
+
+    def get(self, value, default=None):
+        """Return the set of IDs with the value, or `default` if none."""
+        start, stop = self.span(value, value)
+        return self.ids(start, stop) or default
+
+    def span(
+        self,
+        low=None,
+        high=None,
+        low_inclusive: bool = True,
+        high_inclusive: bool = True,
+    ) -> tuple:
+        """Return the (start, stop) positions of pairs within the bounds."""
+        pairs = self.pairs()
+        start = 0
+        if low is not None:
+            start = bisect_left(pairs, (low,) if low_inclusive else (low, _AFTER))
+        stop = len(pairs)
+        if high is not None:
+            stop = bisect_left(pairs, (high, _AFTER) if high_inclusive else (high,))
+        return start, max(start, stop)
+
+    def ids(self, start: int, stop: int) -> set:
+        """Return the IDs of the pairs between two positions."""
+        return {record_id for _, record_id in self.pairs()[start:stop]}
+
+    def walk(self, start: int, stop: int, descending: bool = False):
+        """Iterate over pairs between two positions in value order.
+
+        Descending walks keep pairs of equal values in ID order, like a
+        stable sort of records read in ID order does.
+        """
+        pairs = self.pairs()
+        if not descending:
+            yield from pairs[start:stop]
+            return
+        while stop > start:
+            group = bisect_left(pairs, (pairs[stop - 1][0],), start, stop)
+            yield from pairs[group:stop]
+            stop = group
+
+
+def _contains(pairs: list, pair: tuple) -> bool:
+    position = bisect_left(pairs, pair)
+    return position < len(pairs) and pairs[position] == pair
+
+
+def build_index(table_data: list, column: str, kind: str = "hash"):
+    """Build a value -> set of IDs index, or a SortedIndex for "sorted"."""
+    if kind == "sorted":
+        return SortedIndex(
+            (record[column], record["ID"])
+            for record in table_data
+            if column in record
+        )
+    index = {}
+    for record in table_data:
+        if column in record:
+            index.setdefault(record[column], set()).add(record["ID"])
+    return index
+
+
+def add_record(indexes: Optional[dict], record: dict) -> None:
+    """Register a record in every index of the table."""
+    if not indexes:
+        return
+    for column, index in indexes.items():
+        if column not in record:
+            continue
+        if isinstance(index, SortedIndex):
+            index.add(record[column], record["ID"])
+        else:
+            index.setdefault(record[column], set()).add(record["ID"])
+
+
+def remove_record(indexes: Optional[dict], record: dict) -> None:
+    """Drop a record from every index of the table."""
+    if not indexes:
+        return
+    for column, index in indexes.items():
+        if column not in record:
+            continue
+        if isinstance(index, SortedIndex):
+            index.discard(record[column], record["ID"])
+            continue
+        ids = index.get(record[column])
+        if ids is None:
+            continue
+        ids.discard(record["ID"])
+        if not ids:
+            del index[record[column]]
+
+
+def lookup(indexes: Optional[dict], where_clause: dict) -> Optional[set]:
+    """Return candidate IDs for an equality WHERE clause.
+
+    None means no index covers the clause and the caller has to scan.
+    Candidates may be a superset of the matches, so callers re-check them.
+    "ID" is the primary key: records are found by position in ID order.
+    """
+    record_id = where_clause.get("ID")
+    if isinstance(record_id, int) and not isinstance(record_id, bool):
+        return {record_id}
+    if not indexes:
+        return None
+    for column, value in where_clause.items():
+        index = indexes.get(column)
+        if index is not None:
+            return index.get(value, set())
+    return None
+
+
+def range_lookup(
+    indexes: Optional[dict],
+    bounds: dict,
+    max_rows: int,
+) -> Optional[set]:
+    """Return candidate IDs for range bounds from the narrowest sorted index.
+
+    `bounds` maps columns to (low, low_inclusive, high, high_inclusive).
+    None means no sorted index covers the bounds with at most `max_rows`
+    pairs, and the caller has to scan. Candidates are re-checked too.
+    """
+    best = None
+    for column, (low, low_inclusive, high, high_inclusive) in bounds.items():
+        index = indexes.get(column) if indexes else None
+        if not isinstance(index, SortedIndex):
+            continue
+        start, stop = index.span(low, high, low_inclusive, high_inclusive)
+        if stop - start <= max_rows and (
+            best is None or stop - start < best[2] - best[1]
+        ):
+            best = (index, start, stop)
+    if best is None:
+        return None
+    index, start, stop = best
+    return index.ids(start, stop)
+
+
+def to_json(indexes: dict) -> dict:
+    """Convert indexes to a JSON-friendly form that keeps value types."""
+    return {
+        column: (
+            {"sorted": [list(pair) for pair in index.pairs()]}
+            if isinstance(index, SortedIndex)
+            else [[value, sorted(ids)] for value, ids in index.items()]
+        )
+        for column, index in indexes.items()
+    }
+
+
+def from_json(data: dict) -> dict:
+    """Restore indexes saved with to_json."""
+    return {
+        column: (
+            SortedIndex(tuple(pair) for pair in saved["sorted"])
+            if isinstance(saved, dict)
+            else {value: set(ids) for value, ids in saved}
+        )
+        for column, saved in data.items()
+    }
+
+
+def kinds_of_json(data: dict) -> dict:
+    """Return the kind of every index of a to_json snapshot by column."""
+    return {
+        column: "sorted" if isinstance(saved, dict) else "hash"
+        for column, saved in data.items()
+    }
@@ -1,12 +1,109 @@
 #!/usr/bin/env python3
 """Entry point for the primitive_db application."""
 
-from src.primitive_db.engine import run
+import argparse
+
+from src.primitive_db import metrics, parallel
+from src.primitive_db.constants import DEFAULT_PORT
+from src.primitive_db.decorators import set_auto_confirm
+from src.primitive_db.engine import run, run_command, run_script
 
 
 def main() -> None:
     """Main entry point of the application."""
-    run()
+    args = _parse_args()
+    if args.yes:
+        set_auto_confirm(True)
+    if args.metrics is not None:
+        metrics.enable(True)
+    if args.profile is not None:
+        metrics.set_profile_dir(args.profile)
+    if args.workers is not None:
+        parallel.set_workers(args.workers)
+    
+    try:
+        if args.mode == "serve":
+            # The server and asyncio are only imported when they are used.
+            from src.primitive_db.server import serve
+            
+            serve(args.host, args.port)
+        elif args.command is not None:
+            run_command(args.command)
+        elif args.script is not None:
+            run_script(args.script, args.flush_every)
+        else:
+            run()
+    finally:
+        if args.metrics is not None:
+            metrics.dump(args.metrics)
+
+
+def _parse_args() -> argparse.Namespace:
+    """Parse command line options."""
+    arg_parser = argparse.ArgumentParser(
+        prog="database",
+        description="Простая реляционная база данных.",
+    )
+    arg_parser.add_argument(
+        "mode",
+        nargs="?",
+        choices=("serve",),
+        help="serve - принимать команды от клиентов по сети",
+    )
+    arg_parser.add_argument(
+        "-c",
+        "--command",
+        metavar="COMMAND",
+        help="выполнить одну команду и выйти",
+    )
+    arg_parser.add_argument(
+        "--script",
+        metavar="FILE",
+        help='выполнить команды из файла ("-" - из stdin) без диалога',
+    )
+    arg_parser.add_argument(
+        "-y",
+        "--yes",
+        action="store_true",
+        help="подтверждать опасные операции автоматически",
+    )
+    arg_parser.add_argument(
+        "--flush-every",
+        type=int,
+        default=0,
+        metavar="N",
+        help="в режиме --script записывать изменения каждые N команд "
+             "(по умолчанию - один раз в конце)",
+    )
+    arg_parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="в режиме serve - адрес для подключений (по умолчанию 127.0.0.1)",
+    )
+    arg_parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"в режиме serve - порт (по умолчанию {DEFAULT_PORT})",
+    )
+    arg_parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="собирать метрики и записать их в JSON-файл при выходе",
+    )
+    arg_parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        help="профилировать каждую команду (cProfile) в файлы каталога DIR",
+    )
+    arg_parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="N",
+        help="число процессов для параллельного просмотра больших бинарных "
+             "таблиц (по умолчанию - число ядер, 1 - выключить)",
+    )
+    return arg_parser.parse_args()
 
 
 if __name__ == "__main__":
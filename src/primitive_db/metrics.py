@@ -0,0 +1,220 @@
+"""Opt-in instrumentation: phase timers, row counters and latency histograms.
+
+Collection is off by default. While it is off, phase() returns a shared
+no-op timer and count() returns at once, so instrumented code pays only a
+flag check.
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Optional
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class Histogram:
+    """Latency distribution with fixed buckets plus count, sum, min and max."""
+
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+
+    def quantile(self, q: float) -> float:
+        """Return the upper bucket bound below which `q` of samples fall."""
+        if not self.count:
+            return 0.0
+        seen = 0
+        for bound, hits in zip(BUCKETS, self.buckets):
+            seen += hits
+            if seen >= q * self.count:
+                return max(self.min, min(bound, self.max))
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([*map(str, BUCKETS), "inf"], self.buckets)),
+        }
+
+
+class MetricsRegistry:
+    """Named timers and counters shared by the whole process."""
+
+    def __init__(self):
+        self.timers = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.timers.get(name)
+            if histogram is None:
+                histogram = self.timers[name] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self.timers.clear()
+            self.counters.clear()
+
+    def snapshot(self) -> dict:
+        """Return all metrics as plain data, sorted by name."""
+        with self._lock:
+            return {
+                "timers": {
+                    name: self.timers[name].to_dict() for name in sorted(self.timers)
+                },
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+
+class _Timer:
+    """Context manager adding its duration to a registry timer."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        registry.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class TimedIterator:
+    """Iterator wrapper adding up the time spent getting each item."""
+
+    __slots__ = ("_items", "seconds")
+
+    def __init__(self, items):
+        self._items = iter(items)
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self._items)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+class _NullTimer:
+    """Shared do-nothing timer used while collection is off."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class _Profile:
+    """Context manager writing cProfile stats of its block to a file."""
+
+    def __init__(self, path: Path):
+        import cProfile
+
+        self.path = path
+        self.profile = cProfile.Profile()
+
+    def __enter__(self):
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.disable()
+        self.profile.dump_stats(self.path)
+        return False
+
+
+registry = MetricsRegistry()
+_NULL_TIMER = _NullTimer()
+_enabled = False
+_profile_dir = None
+_profile_number = 0
+
+
+def enable(enabled: bool = True) -> None:
+    """Turn metrics collection on or off."""
+    global _enabled
+    _enabled = enabled
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def phase(name: str):
+    """Time a block into the "phase.<name>" timer when collection is on."""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(f"phase.{name}")
+
+
+def observe(name: str, seconds: float) -> None:
+    """Record a duration when collection is on."""
+    if _enabled:
+        registry.observe(name, seconds)
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Add to the "rows.<name>" counter when collection is on."""
+    if _enabled:
+        registry.increment(f"rows.{name}", amount)
+
+
+def dump(path: str) -> None:
+    """Write a snapshot of all metrics to a JSON file."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(registry.snapshot(), f, indent=4, ensure_ascii=False)
+
+
+def set_profile_dir(path: Optional[str]) -> None:
+    """Profile every command with cProfile into `path`; None turns it off."""
+    global _profile_dir
+    if path is not None:
+        Path(path).mkdir(parents=True, exist_ok=True)
+    _profile_dir = path
+
+
+def profiled(command: str):
+    """Return a context manager profiling one command, if profiling is on."""
+    if _profile_dir is None:
+        return _NULL_TIMER
+    global _profile_number
+    _profile_number += 1
+    return _Profile(Path(_profile_dir) / f"{_profile_number:05d}-{command}.prof")
@@ -0,0 +1,165 @@
+"""Parallel scans of large binary tables in a pool of worker processes.
+
+The slots of a binary table are split into ranges, and each range is
+filtered or aggregated by a worker that maps the same table files
+read-only. Rows are thus shared through the page cache instead of being
+pickled; only matching positions and partial aggregates are sent back and
+merged in range order. Binary tables of at least PARALLEL_MIN_ROWS live
+rows are scanned this way automatically while more than one worker is
+configured.
+"""
+
+import os
+import threading
+from array import array
+
+from src.primitive_db import core
+from src.primitive_db.binary import BinaryTable
+from src.primitive_db.constants import PARALLEL_CHUNK_ROWS, PARALLEL_MIN_ROWS
+
+_workers = os.cpu_count() or 1
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def set_workers(workers: int) -> None:
+    """Set the number of worker processes; 1 or less turns parallel scans off."""
+    global _workers, _pool
+    with _pool_lock:
+        _workers = workers
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def eligible(table_data) -> bool:
+    """Check whether a table is large enough to be scanned in parallel."""
+    return (
+        _workers > 1
+        and isinstance(table_data, BinaryTable)
+        and len(table_data) >= PARALLEL_MIN_ROWS
+    )
+
+
+def scan(table_data: BinaryTable, where_clause: tuple):
+    """Yield positions of records matching the clause, in table order.
+
+    All ranges are submitted at once; when the caller stops early, e.g.
+    at a select limit, the ranges not started yet are cancelled.
+    """
+    source = _source(table_data)
+    futures = [
+        _executor().submit(_scan_range, *source, start, stop, where_clause)
+        for start, stop in _ranges(table_data)
+    ]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def aggregate(
+    table_data: BinaryTable,
+    columns: list,
+    where_clause,
+    key_slots: list,
+    value_slots: list,
+    funcs: list,
+) -> dict:
+    """Accumulate aggregate groups over the ranges and merge them.
+
+    Arguments are those of core._accumulate; groups keep the order of
+    their first appearance in the table.
+    """
+    source = _source(table_data)
+    futures = [
+        _executor().submit(
+            _aggregate_range,
+            *source,
+            start,
+            stop,
+            columns,
+            where_clause,
+            key_slots,
+            value_slots,
+            funcs,
+        )
+        for start, stop in _ranges(table_data)
+    ]
+    groups = {}
+    for future in futures:
+        core._merge_groups(groups, future.result())
+    return groups
+
+
+def _executor():
+    """Return the worker pool, starting it on first use."""
+    global _pool
+    # multiprocessing and concurrent.futures are imported only when a pool
+    # is needed: they make up a large part of the startup time.
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server runs commands in threads
+            _pool = ProcessPoolExecutor(
+                max_workers=_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def _init_worker() -> None:
+    """Keep workers from starting pools of their own."""
+    global _workers
+    _workers = 1
+
+
+def _source(table_data: BinaryTable) -> tuple:
+    """Return the file paths workers open, after publishing pending strings."""
+    table_data.share()
+    return str(table_data.path), str(table_data.heap_path)
+
+
+def _ranges(table_data: BinaryTable) -> list:
+    """Split the slots into at least one range per worker."""
+    slots = table_data.slots
+    step = max(1, min(PARALLEL_CHUNK_ROWS, -(-slots // _workers)))
+    return [(start, min(start + step, slots)) for start in range(0, slots, step)]
+
+
+def _open_range(path: str, heap_path: str, start: int, stop: int) -> BinaryTable:
+    table = BinaryTable(path, heap_path, readonly=True)
+    table.restrict(start, stop)
+    return table
+
+
+def _scan_range(path, heap_path, start, stop, where_clause) -> array:
+    """Worker: return positions in one range that match the clause."""
+    table = _open_range(path, heap_path, start, stop)
+    try:
+        return array("q", core._scan(table, where_clause))
+    finally:
+        table.close()
+
+
+def _aggregate_range(
+    path, heap_path, start, stop, columns, where_clause, key_slots, value_slots, funcs
+) -> dict:
+    """Worker: return the aggregate groups of one range."""
+    table = _open_range(path, heap_path, start, stop)
+    try:
+        # No reference to the value iterators may outlive the call: they
+        # hold views of the mapping, which close() has to release.
+        return core._accumulate(
+            core._iter_values(table, columns, where_clause, None),
+            key_slots,
+            value_slots,
+            funcs,
+        )
+    finally:
+        table.close()
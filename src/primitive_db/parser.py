@@ -1,101 +1,644 @@
-"""Command parsers for WHERE and SET clauses."""
+"""Command parser: a single-pass tokenizer and a statement AST.
 
-from typing import Optional
+A command is split into tokens by one regular expression, with quoted
+strings and integers converted while tokenizing, and then parsed into a
+Statement. Parsed statements are cached twice: by the exact text, and by
+the shape of the command, in which every literal is a "?" placeholder.
+A command differing from a cached one only in its values, such as the
+next insert of a script, is bound to the cached shape without parsing.
+"""
 
+import re
+from typing import NamedTuple, Optional
 
-def parse_where_clause(where_str: str) -> Optional[dict]:
-    """Parse WHERE clause into a dictionary."""
-    if not where_str or "=" not in where_str:
+from src.primitive_db import metrics
+from src.primitive_db.constants import OUTPUT_FORMATS, STATEMENT_CACHE_ENTRIES
+from src.primitive_db.decorators import create_cacher
+
+SELECT_OPTIONS = ("limit", "offset", "format")
+AGGREGATE_FUNCTIONS = ("count", "sum", "min", "max", "avg")
+
+_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<string>"[^"]*"|'[^']*')
+        |(?P<number>[-+]?\d+)(?![^\s(),=<>!"'])
+        |(?P<op><=|>=|!=|<>|=|<|>)
+        |(?P<punct>[(),])
+        |(?P<word>[^\s(),=<>!"']+)
+    )\s*""",
+    re.VERBOSE,
+)
+
+
+class Param(NamedTuple):
+    """Placeholder for the literal number `index` of a statement.
+
+    With `raw` the literal is bound as written (a path, a column
+    definition), otherwise as its converted value.
+    """
+    
+    index: int
+    raw: bool = False
+
+
+class Statement(NamedTuple):
+    """Parsed command.
+
+    `error` is None for a valid command, otherwise the kind of mistake:
+    "syntax" for the general form of the command, or the clause that
+    failed to parse ("values", "set", "no_where", "where", "items",
+    "join", "group_by", "order_by", "options"). `join` of a select is
+    (table, column, column) with the ON columns as written, e.g.
+    ("b", "a.id", "b.a_id"); `order_by` is ((func, column), descending)
+    with the item in the form of the select list.
+    """
+    
+    command: str
+    table: Optional[str] = None
+    args: tuple = ()
+    values: tuple = ()
+    assignments: tuple = ()
+    items: Optional[tuple] = None
+    join: Optional[tuple] = None
+    where: Optional[tuple] = None
+    group_by: tuple = ()
+    order_by: Optional[tuple] = None
+    limit: Optional[int] = None
+    offset: int = 0
+    output_format: str = "table"
+    error: Optional[str] = None
+
+
+class _ParseError(ValueError):
+    """Raised with the Statement error kind of a malformed command."""
+
+
+def parse_statement(text: str) -> Optional[Statement]:
+    """Parse a command into a Statement, using the statement caches.
+
+    Returns None when the text cannot be tokenized, e.g. for an unclosed
+    quote.
+    """
+    return _statements(text, lambda: _parse_text(text))
+
+
+def parse_where_clause(where_str: str) -> Optional[tuple]:
+    """Parse WHERE clause into an AST.
+
+    Grammar: comparisons `column op value` with op one of
+    =, !=, <>, <, <=, >, >=, and `column between low and high`, combined
+    with NOT, AND, OR and parentheses.
+    Nodes are tuples: ("cmp", op, column, value), ("not", node),
+    ("and", (node, ...)) and ("or", (node, ...)).
+    """
+    if not where_str:
         return None
     
-    try:
-        parts = where_str.split("=", 1)
-        if len(parts) != 2:
+    with metrics.phase("parse"):
+        tokenized = _tokenize(where_str)
+        if tokenized is None:
             return None
         
-        column = parts[0].strip()
-        value_str = parts[1].strip()
-        value = _convert_value(value_str)
-        
-        return {column: value}
-    except Exception:
+        tokens, literals = tokenized
+        try:
+            node, position = _parse_or(tokens, 0)
+        except (IndexError, ValueError):
+            return None
+    
+    if position != len(tokens):
         return None
+    return _bind(node, literals)
 
 
-def parse_set_clause(set_str: str) -> Optional[dict]:
-    """Parse SET clause into a dictionary."""
-    if not set_str:
+def _parse_text(text: str) -> Optional[Statement]:
+    """Tokenize a command and bind its literals to the parsed shape."""
+    tokenized = _tokenize(text)
+    if tokenized is None:
         return None
     
-    try:
-        result = {}
-        assignments = _split_by_comma(set_str)
-        
-        for assignment in assignments:
-            if "=" not in assignment:
-                continue
-            
-            parts = assignment.split("=", 1)
-            if len(parts) != 2:
-                continue
-            
-            column = parts[0].strip()
-            value_str = parts[1].strip()
-            value = _convert_value(value_str)
-            result[column] = value
-        
-        return result if result else None
-    except Exception:
+    tokens, literals = tokenized
+    if not tokens or tokens[0][0] != "word":
         return None
+    
+    template = _templates(tokens, lambda: _parse_tokens(tokens))
+    if not literals or template.error is not None:
+        return template
+    
+    statement = template._make(_bind(field, literals) for field in template)
+    if statement.command == "select" and not (
+        _is_count(statement.offset)
+        and (statement.limit is None or _is_count(statement.limit))
+    ):
+        return statement._replace(error="options")
+    return statement
+
+
+def _tokenize(text: str) -> Optional[tuple]:
+    """Split text into the shape tokens and the list of literals.
+
+    Tokens are (kind, text) pairs with kind "word", "op", "(", ")" or ",";
+    a literal becomes ("literal", number) and its (value, raw text) pair is
+    appended to the literals.
+    """
+    tokens = []
+    literals = []
+    position = 0
+    length = len(text)
+    match_token = _TOKEN.match
+    
+    while position < length:
+        match = match_token(text, position)
+        if match is None:
+            return None
+        position = match.end()
+        kind = match.lastgroup
+        token = match.group(kind)
+        
+        if kind == "word" or kind == "op":
+            tokens.append((kind, token))
+        elif kind == "punct":
+            tokens.append((token, token))
+        else:
+            tokens.append(("literal", len(literals)))
+            if kind == "string":
+                literals.append((token[1:-1], token[1:-1]))
+            else:
+                literals.append((int(token), token))
+    
+    return tuple(tokens), literals
+
+
+def _bind(node, literals: list):
+    """Replace the Param placeholders of a parsed node with literals."""
+    if type(node) is Param:
+        value, raw = literals[node.index]
+        return raw if node.raw else value
+    if type(node) is tuple:
+        return tuple(_bind(child, literals) for child in node)
+    return node
+
+
+def _is_count(value) -> bool:
+    return type(value) is int and value >= 0
 
 
-def _convert_value(value_str: str):
-    """Convert string value to appropriate Python type."""
-    value_str = value_str.strip()
+def _parse_tokens(tokens: tuple) -> Statement:
+    """Parse the shape of a command into a Statement with placeholders."""
+    command = tokens[0][1].lower()
+    parse = _COMMANDS.get(command)
+    if parse is None:
+        return Statement(command, args=_raw_args(tokens, 1))
     
-    # Строки в кавычках
-    if (value_str.startswith('"') and value_str.endswith('"')) or \
-       (value_str.startswith("'") and value_str.endswith("'")):
-        return value_str[1:-1]
+    try:
+        return parse(command, tokens)
+    except _ParseError as e:
+        return Statement(command, error=str(e))
+    except IndexError:
+        return Statement(command, error="syntax")
+
+
+def _parse_plain(command: str, tokens: tuple) -> Statement:
+    """exit | help | list_tables | stats [<arg> ...]"""
+    return Statement(command, args=_raw_args(tokens, 1))
+
+
+def _parse_table_command(command: str, tokens: tuple) -> Statement:
+    """drop_table | info | compact <table>"""
+    table, position = _name(tokens, 1)
+    _end(tokens, position, "syntax")
+    return Statement(command, table)
+
+
+def _parse_table_argument(command: str, tokens: tuple) -> Statement:
+    """convert <table> <storage>"""
+    table, position = _name(tokens, 1)
+    argument, position = _name(tokens, position)
+    _end(tokens, position, "syntax")
+    return Statement(command, table, args=(argument,))
+
+
+def _parse_create_index(command: str, tokens: tuple) -> Statement:
+    """create_index <table> <column> [hash|sorted]"""
+    table, position = _name(tokens, 1)
+    column, position = _name(tokens, position)
+    kind = "hash"
+    if position < len(tokens):
+        kind, position = _name(tokens, position)
+        kind = kind.lower()
+    _end(tokens, position, "syntax")
+    return Statement(command, table, args=(column, kind))
+
+
+def _parse_create_table(command: str, tokens: tuple) -> Statement:
+    """create_table <table> <column:type> ..."""
+    table, position = _name(tokens, 1)
+    columns = _raw_args(tokens, position)
+    if not columns:
+        raise _ParseError("syntax")
+    return Statement(command, table, args=columns)
+
+
+def _parse_load(command: str, tokens: tuple) -> Statement:
+    """load <table> from <file>"""
+    table, position = _name(tokens, 1)
+    position = _keyword(tokens, position, "from")
+    path = _raw_args(tokens, position)
+    if len(path) != 1:
+        raise _ParseError("syntax")
+    return Statement(command, table, args=path)
+
+
+def _parse_insert(command: str, tokens: tuple) -> Statement:
+    """insert into <table> values (<value>, ...)"""
+    position = _keyword(tokens, 1, "into")
+    table, position = _name(tokens, position)
+    position = _keyword(tokens, position, "values")
+    if position == len(tokens):
+        raise _ParseError("syntax")
     
-    # Булевы значения
-    if value_str.lower() == "true":
-        return True
-    if value_str.lower() == "false":
-        return False
+    try:
+        values, position = _parse_values(tokens, position)
+    except (IndexError, ValueError):
+        raise _ParseError("values") from None
+    _end(tokens, position, "values")
+    return Statement(command, table, values=values)
+
+
+def _parse_update(command: str, tokens: tuple) -> Statement:
+    """update <table> set <column> = <value>, ... where <condition>"""
+    table, position = _name(tokens, 1)
+    position = _keyword(tokens, position, "set")
+    if position == len(tokens):
+        raise _ParseError("syntax")
+    if not any(_is_keyword(tokens, i, "where") for i in range(len(tokens))):
+        raise _ParseError("no_where")
     
-    # Целые числа
+    assignments = []
     try:
-        return int(value_str)
-    except ValueError:
-        pass
-    
-    return value_str
-
-
-def _split_by_comma(s: str) -> list:
-    """Split string by comma, but not inside quotes."""
-    parts = []
-    current = ""
-    in_quotes = False
-    quote_char = None
-    
-    for char in s:
-        if char in ('"', "'") and (not in_quotes or char == quote_char):
-            if in_quotes and char == quote_char:
-                in_quotes = False
-                quote_char = None
-            elif not in_quotes:
-                in_quotes = True
-                quote_char = char
-            current += char
-        elif char == "," and not in_quotes:
-            parts.append(current.strip())
-            current = ""
+        while True:
+            (column_kind, column), (op_kind, op) = tokens[position:position + 2]
+            if column_kind != "word" or op != "=":
+                raise ValueError("expected assignment")
+            assignments.append((column, _value(tokens[position + 2])))
+            position += 3
+            if not _is_punct(tokens, position, ","):
+                break
+            position += 1
+    except (IndexError, ValueError):
+        raise _ParseError("set") from None
+    
+    if not _is_keyword(tokens, position, "where"):
+        raise _ParseError("set")
+    where, position = _parse_condition(tokens, position + 1, "set")
+    _end(tokens, position, "set")
+    return Statement(command, table, assignments=tuple(assignments), where=where)
+
+
+def _parse_delete(command: str, tokens: tuple) -> Statement:
+    """delete from <table> where <condition>"""
+    position = _keyword(tokens, 1, "from")
+    table, position = _name(tokens, position)
+    position = _keyword(tokens, position, "where")
+    where, position = _parse_condition(tokens, position, "where")
+    _end(tokens, position, "where")
+    return Statement(command, table, where=where)
+
+
+def _parse_select(command: str, tokens: tuple) -> Statement:
+    """select [<items>] from <table> [join <table> on <column> = <column>]
+    [where <condition>] [group by <columns>] [order by <item> [asc|desc]]
+    [limit <n>] [offset <n>] [format <name>]"""
+    if not any(_is_keyword(tokens, i, "from") for i in range(len(tokens))):
+        raise _ParseError("syntax")
+    
+    items = None
+    position = 1
+    if not _is_keyword(tokens, position, "from"):
+        items, position = _parse_select_list(tokens, position)
+    position = _keyword(tokens, position, "from")
+    table, position = _name(tokens, position)
+    clause = "syntax"
+    
+    join = None
+    if _is_keyword(tokens, position, "join"):
+        if items is not None:
+            raise _ParseError("join")
+        join, position = _parse_join(tokens, position + 1)
+        clause = "join"
+    
+    where = None
+    if _is_keyword(tokens, position, "where"):
+        where, position = _parse_condition(tokens, position + 1, "where")
+        clause = "where"
+    
+    group_by = ()
+    if _is_keyword(tokens, position, "group"):
+        if items is None or not _is_keyword(tokens, position + 1, "by"):
+            raise _ParseError("group_by")
+        group_by, position = _parse_names(tokens, position + 2, "group_by")
+        clause = "group_by"
+    
+    order_by = None
+    if _is_keyword(tokens, position, "order"):
+        order_by, position = _parse_order_by(tokens, position + 1)
+        clause = "order_by"
+    
+    options = {"limit": None, "offset": 0, "format": "table"}
+    seen = set()
+    while position < len(tokens):
+        kind, text = tokens[position]
+        keyword = text.lower() if kind == "word" else None
+        if keyword not in SELECT_OPTIONS:
+            raise _ParseError(clause)
+        if keyword in seen or position + 1 == len(tokens):
+            raise _ParseError("options")
+        seen.add(keyword)
+        clause = "options"
+        
+        value_kind, value = tokens[position + 1]
+        if keyword == "format":
+            if value_kind != "word" or value.lower() not in OUTPUT_FORMATS:
+                raise _ParseError("options")
+            options[keyword] = value.lower()
+        elif value_kind == "literal":
+            options[keyword] = Param(value)
         else:
-            current += char
+            raise _ParseError("options")
+        position += 2
     
-    if current.strip():
-        parts.append(current.strip())
+    return Statement(
+        command,
+        table,
+        items=items,
+        join=join,
+        where=where,
+        group_by=group_by,
+        order_by=order_by,
+        limit=options["limit"],
+        offset=options["offset"],
+        output_format=options["format"],
+    )
+
+
+def _parse_join(tokens: tuple, position: int) -> tuple:
+    """Parse `<table> on <column> = <column>` after the join keyword."""
+    try:
+        table, position = _name(tokens, position)
+        position = _keyword(tokens, position, "on")
+        (left_kind, left), (_, op), (right_kind, right) = (
+            tokens[position:position + 3]
+        )
+    except (_ParseError, ValueError):
+        raise _ParseError("join") from None
+    if left_kind != "word" or op != "=" or right_kind != "word":
+        raise _ParseError("join")
+    return (table, left, right), position + 3
+
+
+def _parse_order_by(tokens: tuple, position: int) -> tuple:
+    """Parse `by <item> [asc|desc]` after the order keyword.
+
+    Besides the items of a select list, the column may be qualified with
+    its table (<table>.<column>) for joins.
+    """
+    if not _is_keyword(tokens, position, "by"):
+        raise _ParseError("order_by")
+    position += 1
+    kind, name = tokens[position] if position < len(tokens) else (None, "")
+    if kind == "word" and "." in name and not _is_punct(tokens, position + 1, "("):
+        items = ((None, name),)
+        position += 1
+    else:
+        try:
+            items, position = _parse_select_list(tokens, position)
+        except (_ParseError, IndexError, ValueError):
+            raise _ParseError("order_by") from None
+    if len(items) != 1:
+        raise _ParseError("order_by")
     
-    return parts
+    descending = False
+    if _is_keyword(tokens, position, "desc"):
+        descending = True
+        position += 1
+    elif _is_keyword(tokens, position, "asc"):
+        position += 1
+    return (items[0], descending), position
+
+
+def _parse_select_list(tokens: tuple, position: int) -> tuple:
+    """Parse the column list of an aggregate select.
+
+    Items are plain columns or func(column) with func one of
+    AGGREGATE_FUNCTIONS; count also accepts *. Returns (func, column)
+    pairs, func being None for plain columns and column None for *.
+    """
+    items = []
+    while True:
+        kind, name = tokens[position] if position < len(tokens) else (None, "")
+        if kind != "word":
+            raise _ParseError("items")
+        
+        if _is_punct(tokens, position + 1, "("):
+            func = name.lower()
+            column_kind, column = tokens[position + 2]
+            if (
+                func not in AGGREGATE_FUNCTIONS
+                or column_kind != "word"
+                or not _is_punct(tokens, position + 3, ")")
+            ):
+                raise _ParseError("items")
+            if column == "*":
+                if func != "count":
+                    raise _ParseError("items")
+                column = None
+            elif not column.isidentifier():
+                raise _ParseError("items")
+            items.append((func, column))
+            position += 4
+        elif name.isidentifier():
+            items.append((None, name))
+            position += 1
+        else:
+            raise _ParseError("items")
+        
+        if not _is_punct(tokens, position, ","):
+            return tuple(items), position
+        position += 1
+
+
+def _parse_names(tokens: tuple, position: int, error: str) -> tuple:
+    """Parse a comma separated list of column names."""
+    names = []
+    while True:
+        kind, name = tokens[position] if position < len(tokens) else (None, "")
+        if kind != "word" or not name.isidentifier():
+            raise _ParseError(error)
+        names.append(name)
+        position += 1
+        if not _is_punct(tokens, position, ","):
+            return tuple(names), position
+        position += 1
+
+
+def _parse_values(tokens: tuple, position: int) -> tuple:
+    """Parse a value list, optionally in parentheses."""
+    parenthesized = _is_punct(tokens, position, "(")
+    if parenthesized:
+        position += 1
+    
+    values = [_value(tokens[position])]
+    position += 1
+    while _is_punct(tokens, position, ","):
+        values.append(_value(tokens[position + 1]))
+        position += 2
+    
+    if parenthesized:
+        if not _is_punct(tokens, position, ")"):
+            raise ValueError("expected )")
+        position += 1
+    return tuple(values), position
+
+
+def _parse_condition(tokens: tuple, position: int, error: str) -> tuple:
+    """Parse a WHERE condition, failing with the given error kind."""
+    try:
+        return _parse_or(tokens, position)
+    except (IndexError, ValueError):
+        raise _ParseError(error) from None
+
+
+def _parse_or(tokens: tuple, position: int) -> tuple:
+    """or_expr := and_expr ("or" and_expr)*"""
+    node, position = _parse_and(tokens, position)
+    children = [node]
+    while _is_keyword(tokens, position, "or"):
+        node, position = _parse_and(tokens, position + 1)
+        children.append(node)
+    if len(children) == 1:
+        return children[0], position
+    return ("or", tuple(children)), position
+
+
+def _parse_and(tokens: tuple, position: int) -> tuple:
+    """and_expr := not_expr ("and" not_expr)*"""
+    node, position = _parse_not(tokens, position)
+    children = [node]
+    while _is_keyword(tokens, position, "and"):
+        node, position = _parse_not(tokens, position + 1)
+        children.append(node)
+    if len(children) == 1:
+        return children[0], position
+    return ("and", tuple(children)), position
+
+
+def _parse_not(tokens: tuple, position: int) -> tuple:
+    """not_expr := "not" not_expr | "(" or_expr ")" | column op value
+    | column "between" value "and" value"""
+    if _is_keyword(tokens, position, "not"):
+        node, position = _parse_not(tokens, position + 1)
+        return ("not", node), position
+    
+    if tokens[position][0] == "(":
+        node, position = _parse_or(tokens, position + 1)
+        if tokens[position][0] != ")":
+            raise ValueError("expected )")
+        return node, position + 1
+    
+    if _is_keyword(tokens, position + 1, "between"):
+        return _parse_between(tokens, position)
+    
+    (column_kind, column), (op_kind, op), value = tokens[position:position + 3]
+    if column_kind != "word" or op_kind != "op":
+        raise ValueError("expected comparison")
+    if op == "<>":
+        op = "!="
+    return ("cmp", op, column, _value(value)), position + 3
+
+
+def _parse_between(tokens: tuple, position: int) -> tuple:
+    """column between low and high, as column >= low and column <= high"""
+    column_kind, column = tokens[position]
+    if column_kind != "word" or not _is_keyword(tokens, position + 3, "and"):
+        raise ValueError("expected between")
+    low = _value(tokens[position + 2])
+    high = _value(tokens[position + 4])
+    node = ("and", (("cmp", ">=", column, low), ("cmp", "<=", column, high)))
+    return node, position + 5
+
+
+def _value(token: tuple):
+    """Return the value of a literal or bare word token."""
+    kind, text = token
+    if kind == "literal":
+        return Param(text)
+    if kind != "word":
+        raise ValueError("expected value")
+    
+    lowered = text.lower()
+    if lowered == "true":
+        return True
+    if lowered == "false":
+        return False
+    return text
+
+
+def _raw_args(tokens: tuple, position: int) -> tuple:
+    """Return the remaining tokens as written, literals unquoted."""
+    return tuple(
+        Param(text, raw=True) if kind == "literal" else text
+        for kind, text in tokens[position:]
+    )
+
+
+def _name(tokens: tuple, position: int) -> tuple:
+    """Return the bare word at `position` and the position after it."""
+    kind, text = tokens[position]
+    if kind != "word":
+        raise _ParseError("syntax")
+    return text, position + 1
+
+
+def _keyword(tokens: tuple, position: int, keyword: str) -> int:
+    """Check that `keyword` is at `position` and return the next position."""
+    if not _is_keyword(tokens, position, keyword):
+        raise _ParseError("syntax")
+    return position + 1
+
+
+def _end(tokens: tuple, position: int, error: str) -> None:
+    if position != len(tokens):
+        raise _ParseError(error)
+
+
+def _is_keyword(tokens: tuple, position: int, keyword: str) -> bool:
+    return (
+        position < len(tokens)
+        and tokens[position][0] == "word"
+        and tokens[position][1].lower() == keyword
+    )
+
+
+def _is_punct(tokens: tuple, position: int, punct: str) -> bool:
+    return position < len(tokens) and tokens[position][0] == punct
+
+
+_COMMANDS = {
+    "exit": _parse_plain,
+    "help": _parse_plain,
+    "list_tables": _parse_plain,
+    "stats": _parse_plain,
+    "create_table": _parse_create_table,
+    "drop_table": _parse_table_command,
+    "info": _parse_table_command,
+    "compact": _parse_table_command,
+    "create_index": _parse_create_index,
+    "convert": _parse_table_argument,
+    "load": _parse_load,
+    "insert": _parse_insert,
+    "update": _parse_update,
+    "delete": _parse_delete,
+    "select": _parse_select,
+}
+
+_statements = create_cacher(STATEMENT_CACHE_ENTRIES)
+_templates = create_cacher(STATEMENT_CACHE_ENTRIES)
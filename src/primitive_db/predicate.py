@@ -0,0 +1,172 @@
+"""Compilation of parsed WHERE clauses into Python callables."""
+
+from functools import lru_cache
+
+_OPERATORS = {"=": "==", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+
+def columns_of(where_clause: tuple) -> tuple:
+    """Return the columns used by a WHERE clause, in order of appearance."""
+    columns = []
+    _collect_columns(where_clause, columns)
+    return tuple(dict.fromkeys(columns))
+
+
+def equality_terms(where_clause: tuple) -> dict:
+    """Return column = value terms that every match has to satisfy.
+
+    Only comparisons joined by AND at the top level qualify; they let an
+    index narrow the candidates before the full predicate is checked.
+    """
+    kind = where_clause[0]
+    if kind == "cmp":
+        _, op, column, value = where_clause
+        return {column: value} if op == "=" else {}
+    if kind == "and":
+        terms = {}
+        for child in where_clause[1]:
+            for column, value in equality_terms(child).items():
+                terms.setdefault(column, value)
+        return terms
+    return {}
+
+
+def range_terms(where_clause: tuple) -> dict:
+    """Return the value range of every column bounded by the clause.
+
+    Ranges are (low, low_inclusive, high, high_inclusive) with None for an
+    open end. Like equality_terms(), only comparisons joined by AND at the
+    top level qualify; several of them on one column are intersected.
+    """
+    bounds = {}
+    _collect_bounds(where_clause, bounds)
+    return bounds
+
+
+def conjuncts(where_clause: tuple) -> tuple:
+    """Return the terms of a top-level AND, or the clause itself."""
+    if where_clause[0] == "and":
+        return where_clause[1]
+    return (where_clause,)
+
+
+def rename_columns(where_clause: tuple, names: dict) -> tuple:
+    """Return a copy of a WHERE clause with columns replaced via `names`."""
+    kind = where_clause[0]
+    if kind == "cmp":
+        _, op, column, value = where_clause
+        return ("cmp", op, names.get(column, column), value)
+    if kind == "not":
+        return ("not", rename_columns(where_clause[1], names))
+    return (
+        kind,
+        tuple(rename_columns(child, names) for child in where_clause[1]),
+    )
+
+
+def normalize(where_clause: tuple) -> tuple:
+    """Return a canonical form of a WHERE clause for use as a cache key.
+
+    Nested AND/OR nodes of the same kind are flattened and their children
+    sorted, so clauses differing only in term order compare equal.
+    """
+    kind = where_clause[0]
+    if kind == "cmp":
+        return where_clause
+    if kind == "not":
+        return ("not", normalize(where_clause[1]))
+
+    children = []
+    for child in where_clause[1]:
+        child = normalize(child)
+        if child[0] == kind:
+            children.extend(child[1])
+        else:
+            children.append(child)
+    return (kind, tuple(sorted(children, key=repr)))
+
+
+@lru_cache(maxsize=256)
+def compile_row_predicate(where_clause: tuple):
+    """Compile a WHERE clause into a function of one record mapping."""
+    columns = columns_of(where_clause)
+    names = {column: f"r[_c{i}]" for i, column in enumerate(columns)}
+    namespace = {f"_c{i}": column for i, column in enumerate(columns)}
+    return _build("r", names, namespace, where_clause)
+
+
+@lru_cache(maxsize=256)
+def compile_column_predicate(where_clause: tuple):
+    """Compile a WHERE clause into a function of the column values.
+
+    The function takes one argument per column of columns_of(where_clause),
+    so it can be mapped over column iterables without building rows.
+    """
+    columns = columns_of(where_clause)
+    names = {column: f"_a{i}" for i, column in enumerate(columns)}
+    return _build(", ".join(names.values()), names, {}, where_clause)
+
+
+def _build(params: str, names: dict, namespace: dict, where_clause: tuple):
+    """Generate and compile the predicate source.
+
+    Only generated identifiers go into the source; column names and values
+    are passed in through the namespace.
+    """
+    expression = _render(where_clause, names, namespace)
+    source = f"def _predicate({params}):\n    return {expression}\n"
+    exec(compile(source, "<where>", "exec"), namespace)
+    return namespace["_predicate"]
+
+
+def _render(node: tuple, names: dict, namespace: dict) -> str:
+    """Render an AST node as a Python expression."""
+    kind = node[0]
+    if kind == "cmp":
+        _, op, column, value = node
+        constant = f"_v{len(namespace)}"
+        namespace[constant] = value
+        return f"({names[column]} {_OPERATORS[op]} {constant})"
+    if kind == "not":
+        return f"(not {_render(node[1], names, namespace)})"
+    joiner = f" {kind} "
+    return "(" + joiner.join(
+        _render(child, names, namespace) for child in node[1]
+    ) + ")"
+
+
+def _collect_bounds(node: tuple, bounds: dict) -> None:
+    """Narrow `bounds` by the comparisons of an AND tree."""
+    kind = node[0]
+    if kind == "and":
+        for child in node[1]:
+            _collect_bounds(child, bounds)
+        return
+    if kind != "cmp" or node[1] == "!=":
+        return
+    
+    _, op, column, value = node
+    low, low_inclusive, high, high_inclusive = bounds.get(
+        column, (None, True, None, True)
+    )
+    if op in (">", ">=", "="):
+        inclusive = op != ">"
+        if low is None or value > low or (value == low and not inclusive):
+            low, low_inclusive = value, inclusive
+    if op in ("<", "<=", "="):
+        inclusive = op != "<"
+        if high is None or value < high or (value == high and not inclusive):
+            high, high_inclusive = value, inclusive
+    bounds[column] = (low, low_inclusive, high, high_inclusive)
+
+
+def _collect_columns(node: tuple, columns: list) -> None:
+    """Append the columns of an AST node to `columns`."""
+    kind = node[0]
+    if kind == "cmp":
+        columns.append(node[2])
+    elif kind == "not":
+        _collect_columns(node[1], columns)
+    else:
+        for child in node[1]:
+            _collect_columns(child, columns)
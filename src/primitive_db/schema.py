@@ -0,0 +1,115 @@
+"""Compilation of table schemas into row validators and constructors."""
+
+from functools import lru_cache
+from typing import Callable, NamedTuple
+
+# Type tests of column values by column type; bool is not an int here.
+_TYPE_TESTS = {
+    "int": "type({}) is int",
+    "str": "isinstance({}, str)",
+    "bool": "type({}) is bool",
+}
+
+
+class RowSchema(NamedTuple):
+    """Compiled schema of one table.
+
+    `build(record_id, values)` checks the count and types of values given in
+    column order and returns the new record; `values(record)` picks them
+    out of a mapping, raising KeyError for a missing column; `checks` maps
+    every column but ID to a function telling whether a value fits it.
+    """
+
+    columns: dict
+    names: tuple
+    build: Callable
+    values: Callable
+    checks: dict
+
+
+def for_table(metadata: dict, table_name: str) -> RowSchema:
+    """Return the compiled schema of a table.
+
+    Compiled schemas are cached by the columns and their types, so a table
+    whose schema changed gets a new one.
+    """
+    return compile_schema(tuple(metadata[table_name].items()))
+
+
+def type_error(value, column_type: str) -> str:
+    """Return the error message for a value not fitting a column type."""
+    return (
+        f"Ошибка: ожидается тип {column_type}, "
+        f"получено {type(value).__name__}."
+    )
+
+
+def check_value(value, column_type: str) -> bool:
+    """Tell whether a value fits a column type."""
+    return _compile_check(column_type)(value)
+
+
+@lru_cache(maxsize=64)
+def compile_schema(columns: tuple) -> RowSchema:
+    """Compile (column, type) pairs of a table, ID included, into a schema."""
+    types = dict(columns)
+    names = tuple(column for column in types if column != "ID")
+    return RowSchema(
+        columns=types,
+        names=names,
+        build=_compile_build(names, tuple(types[name] for name in names)),
+        values=_compile_values(names),
+        checks={name: _compile_check(types[name]) for name in names},
+    )
+
+
+@lru_cache(maxsize=None)
+def _compile_check(column_type: str):
+    return _exec(
+        f"def _check(v):\n    return {_TYPE_TESTS[column_type].format('v')}\n",
+        {},
+        "_check",
+    )
+
+
+def _compile_build(names: tuple, types: tuple):
+    """Generate a function validating values and building the record.
+
+    Values are unpacked into locals and tested inline, so a valid row costs
+    one call and no per-value dispatch on the type name.
+    """
+    namespace = {"_count_error": _count_error, "_type_error": type_error}
+    params = [f"_a{i}" for i in range(len(names))]
+    lines = [
+        "def _build(_id, _values):",
+        f"    if len(_values) != {len(names)}:",
+        f"        raise ValueError(_count_error({len(names)}, len(_values)))",
+    ]
+    if params:
+        lines.append(f"    {', '.join(params)}, = _values")
+    items = ['"ID": _id']
+    for i, (param, column_type) in enumerate(zip(params, types)):
+        namespace[f"_n{i}"] = names[i]
+        namespace[f"_t{i}"] = column_type
+        lines.append(f"    if not {_TYPE_TESTS[column_type].format(param)}:")
+        lines.append(f"        raise ValueError(_type_error({param}, _t{i}))")
+        items.append(f"_n{i}: {param}")
+    lines.append(f"    return {{{', '.join(items)}}}")
+    return _exec("\n".join(lines) + "\n", namespace, "_build")
+
+
+def _compile_values(names: tuple):
+    """Generate a function returning the values of a mapping in column order."""
+    namespace = {f"_n{i}": name for i, name in enumerate(names)}
+    items = "".join(f"_r[_n{i}], " for i in range(len(names)))
+    return _exec(f"def _values(_r):\n    return ({items})\n", namespace, "_values")
+
+
+def _count_error(expected: int, count: int) -> str:
+    return f"Ожидается {expected} значений, получено {count}."
+
+
+def _exec(source: str, namespace: dict, name: str):
+    """Compile generated source; only generated identifiers go into it."""
+    exec(compile(source, "<schema>", "exec"), namespace)
+    return namespace[name]
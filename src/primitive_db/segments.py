@@ -0,0 +1,178 @@
+"""Segmented table data: records split into files by ID range.
+
+Segment k holds the records with IDs from k * rows + 1 to (k + 1) * rows,
+where rows is the segment size of the table. Since IDs only grow, inserts
+land in the last segment, and a change to a record touches exactly one
+segment. Segments are read only when a record in them is needed.
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Callable, Optional
+
+_MISSING = object()
+
+
+def segment_of(record_id: int, rows: int) -> int:
+    """Return the number of the segment holding an ID."""
+    return (record_id - 1) // rows
+
+
+class SegmentedTable:
+    """Table data whose segments are loaded on first access.
+
+    Behaves like the list of records it replaces: positions run over the
+    segments in ID order. `counts` gives the record count of every segment
+    that has not been loaded yet. Logged mutations in `pending` (segment
+    number -> entries) are applied right away, loading those segments.
+    Segments changed since the last save are listed in `dirty`.
+    """
+
+    def __init__(
+        self,
+        rows: int,
+        load_segment: Callable[[int], list],
+        counts: Optional[dict] = None,
+        sequence: int = 0,
+        pending: Optional[dict] = None,
+    ):
+        self.rows = rows
+        self.sequence = sequence
+        self.dirty = set()
+        self._load_segment = load_segment
+        self._segments = {number: None for number in counts or {}}
+        self._counts = dict(counts or {})
+        self._numbers = sorted(self._segments)
+        self._starts = None
+        self.path = None
+
+        for number, entries in sorted((pending or {}).items()):
+            self._apply(number, entries)
+
+    def __len__(self) -> int:
+        return self._offsets()[-1]
+
+    def __getitem__(self, position: int) -> dict:
+        size = len(self)
+        if position < 0:
+            position += size
+        if not 0 <= position < size:
+            raise IndexError("table position out of range")
+        starts = self._offsets()
+        slot = bisect_right(starts, position) - 1
+        return self.segment(self._numbers[slot])[position - starts[slot]]
+
+    def __iter__(self):
+        for number in self._numbers:
+            yield from self.segment(number)
+
+    def segment(self, number: int) -> list:
+        """Return the records of a segment, reading it if needed."""
+        records = self._segments.get(number)
+        if records is None:
+            records = self._load_segment(number)
+            self._segments[number] = records
+            if self._counts.get(number) != len(records):
+                self._counts[number] = len(records)
+                self._starts = None
+        return records
+
+    def counts(self) -> dict:
+        """Return the record count of every segment by segment number."""
+        return dict(self._counts)
+
+    def append(self, record: dict) -> None:
+        """Add a record to the segment of its ID."""
+        number = segment_of(record["ID"], self.rows)
+        if number not in self._segments:
+            self._segments[number] = []
+            self._counts[number] = 0
+            self._numbers.insert(bisect_left(self._numbers, number), number)
+        records = self.segment(number)
+        if records and records[-1]["ID"] > record["ID"]:
+            records.insert(bisect_left(records, record["ID"], key=_record_id), record)
+        else:
+            records.append(record)
+        self._counts[number] += 1
+        self.sequence = max(self.sequence, record["ID"])
+        self._changed(number)
+
+    def positions(self):
+        """Iterate over the positions of all records."""
+        return iter(range(len(self)))
+
+    def position_of(self, record_id: int) -> Optional[int]:
+        """Find the position of a record by ID, reading only its segment."""
+        number = segment_of(record_id, self.rows)
+        if number not in self._segments:
+            return None
+        records = self.segment(number)
+        offset = bisect_left(records, record_id, key=_record_id)
+        if offset < len(records) and records[offset]["ID"] == record_id:
+            return self._offsets()[self._numbers.index(number)] + offset
+        return None
+
+    def column(self, name: str):
+        """Iterate over the values of one column in row order."""
+        return (record.get(name, _MISSING) for record in self)
+
+    def delete_positions(self, positions) -> None:
+        """Delete records at the given positions."""
+        starts = self._offsets()
+        dropped = {}
+        for position in set(positions):
+            slot = bisect_right(starts, position) - 1
+            dropped.setdefault(self._numbers[slot], set()).add(
+                position - starts[slot]
+            )
+
+        for number, offsets in dropped.items():
+            records = self.segment(number)
+            records[:] = [
+                record for offset, record in enumerate(records)
+                if offset not in offsets
+            ]
+            self._counts[number] = len(records)
+            self._changed(number)
+
+    def mark_changed(self, record_id: int) -> None:
+        """Register an in-place change of a record for the next save."""
+        self._changed(segment_of(record_id, self.rows))
+
+    def _apply(self, number: int, entries: list) -> None:
+        """Replay logged mutations of one segment."""
+        if number not in self._segments:
+            self._numbers.insert(bisect_left(self._numbers, number), number)
+        records = {record["ID"]: record for record in self.segment(number)}
+        for entry in entries:
+            op = entry["op"]
+            if op == "insert":
+                record = entry["record"]
+                records[record["ID"]] = record
+                self.sequence = max(self.sequence, record["ID"])
+            elif op == "update":
+                record = records.get(entry["id"])
+                if record is not None:
+                    record.update(entry["values"])
+            elif op == "delete":
+                records.pop(entry["id"], None)
+
+        self._segments[number] = sorted(records.values(), key=_record_id)
+        self._counts[number] = len(records)
+        self._changed(number)
+
+    def _changed(self, number: int) -> None:
+        self.dirty.add(number)
+        self._starts = None
+
+    def _offsets(self) -> list:
+        """Return the first position of every segment, plus the total."""
+        if self._starts is None:
+            starts = [0]
+            for number in self._numbers:
+                starts.append(starts[-1] + self._counts[number])
+            self._starts = starts
+        return self._starts
+
+
+def _record_id(record) -> int:
+    return record["ID"]
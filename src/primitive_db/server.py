@@ -0,0 +1,192 @@
+"""Network server mode: many clients sharing one table cache.
+
+The protocol is line based: a client sends one command per line, using the
+same grammar as the console, and gets the command output back followed by
+a line holding a single ".". Output lines starting with "." are sent with
+one more "." in front, so the terminator is never ambiguous.
+"""
+
+import asyncio
+import contextvars
+import io
+import sys
+
+from src.primitive_db.cache import TableCache
+from src.primitive_db.decorators import set_auto_confirm
+from src.primitive_db.engine import execute_command
+from src.primitive_db.parser import parse_statement
+
+READ_COMMANDS = ("select", "info", "list_tables", "help")
+
+_output = contextvars.ContextVar("output", default=None)
+
+
+class _OutputProxy:
+    """sys.stdout replacement writing to the buffer of the current command."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text: str) -> int:
+        buffer = _output.get()
+        if buffer is None:
+            return self._stream.write(text)
+        return buffer.write(text)
+
+    def flush(self) -> None:
+        if _output.get() is None:
+            self._stream.flush()
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+
+class _ReadWriteLock:
+    """Asyncio lock letting readers share access and writers take it alone.
+
+    Waiting writers block new readers, so a stream of reads cannot starve
+    writes.
+    """
+
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    async def acquire_read(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: not self._writer and not self._waiting_writers
+            )
+            self._readers += 1
+
+    async def release_read(self) -> None:
+        async with self._condition:
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    async def acquire_write(self) -> None:
+        async with self._condition:
+            self._waiting_writers += 1
+            try:
+                await self._condition.wait_for(
+                    lambda: not self._writer and not self._readers
+                )
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+
+    async def release_write(self) -> None:
+        async with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+
+class DatabaseServer:
+    """Serve database commands to concurrent clients.
+
+    Reads run in worker threads in parallel with each other; writes are
+    serialised and run while no read is in progress.
+    """
+
+    def __init__(self, cache: TableCache):
+        self.cache = cache
+        self._lock = _ReadWriteLock()
+
+    async def handle_client(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """Execute commands of one connection until it closes or exits."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                user_input = line.decode("utf-8", errors="replace").strip()
+                if not user_input:
+                    continue
+
+                keep_going, output = await self.execute(user_input)
+                writer.write(_frame(output))
+                await writer.drain()
+                if not keep_going:
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def execute(self, user_input: str) -> tuple[bool, str]:
+        """Run one command under the read or write lock and capture its output."""
+        if _is_read(user_input):
+            await self._lock.acquire_read()
+            try:
+                return await asyncio.to_thread(_run_command, user_input, self.cache)
+            finally:
+                await self._lock.release_read()
+
+        await self._lock.acquire_write()
+        try:
+            return await asyncio.to_thread(_run_command, user_input, self.cache)
+        finally:
+            await self._lock.release_write()
+
+
+def serve(host: str, port: int) -> None:
+    """Run the database server until interrupted."""
+    set_auto_confirm(True)
+    sys.stdout = _OutputProxy(sys.stdout)
+    cache = TableCache()
+    try:
+        asyncio.run(_serve(DatabaseServer(cache), host, port))
+    except KeyboardInterrupt:
+        print("Сервер остановлен.")
+    finally:
+        cache.flush()
+
+
+async def _serve(server: DatabaseServer, host: str, port: int) -> None:
+    listener = await asyncio.start_server(server.handle_client, host, port)
+    print(f"Сервер запущен на {host}:{port}.")
+    async with listener:
+        await listener.serve_forever()
+
+
+def _run_command(user_input: str, cache: TableCache) -> tuple[bool, str]:
+    """Execute a command with its output redirected into a string."""
+    buffer = io.StringIO()
+    _output.set(buffer)
+    try:
+        keep_going = execute_command(user_input, cache)
+    except Exception as e:
+        print(f"Произошла непредвиденная ошибка: {type(e).__name__}: {e}")
+        keep_going = True
+    return keep_going, buffer.getvalue()
+
+
+def _is_read(user_input: str) -> bool:
+    """Check whether a command only reads the database.
+
+    The parsed statement is cached, so the command is not parsed again
+    when it runs.
+    """
+    statement = parse_statement(user_input)
+    return statement is None or statement.command in READ_COMMANDS
+
+
+def _frame(output: str) -> bytes:
+    """Encode command output as a response ending with a "." line."""
+    lines = [
+        "." + line if line.startswith(".") else line
+        for line in output.splitlines()
+    ]
+    lines.append(".")
+    return ("\n".join(lines) + "\n").encode("utf-8")
@@ -1,46 +1,723 @@
 """Utility functions for database operations."""
 
+import csv
 import json
+import os
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows: locking is skipped
+    fcntl = None
+
+from src.primitive_db import index, metrics
+from src.primitive_db.binary import BinaryTable
+from src.primitive_db.constants import (
+    BINARY_SUFFIX,
+    DEFAULT_STORAGE,
+    HEAP_SUFFIX,
+    INDEX_SUFFIX,
+    LOCK_SUFFIX,
+    LOG_COMPACT_MIN_BYTES,
+    LOG_SUFFIX,
+    SEGMENT_ROWS,
+    SEGMENTS_SUFFIX,
+)
+from src.primitive_db.segments import SegmentedTable, segment_of
+
+# The process umask, read once at import: reading it means setting it.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
 
 
 def load_metadata(filepath: str) -> dict:
     """Load metadata from JSON file."""
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
-    except json.JSONDecodeError:
-        return {}
+    with metadata_lock(filepath):
+        return _read_json(Path(filepath), {})
 
 
 def save_metadata(filepath: str, data: dict) -> None:
     """Save metadata to JSON file."""
-    Path(filepath).parent.mkdir(parents=True, exist_ok=True)
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    with metadata_lock(filepath, exclusive=True):
+        with atomic_write(filepath) as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+
 
+@contextmanager
+def atomic_write(filepath):
+    """Open a temporary file that replaces `filepath` once fully written.
 
-def load_table_data(table_name: str, data_dir: str = "data") -> list:
-    """Load table data from JSON file."""
-    filepath = Path(data_dir) / f"{table_name}.json"
+    The data is fsynced before the rename and the directory after it, so
+    after a crash the file holds either the old or the new contents.
+    """
+    # tempfile and shutil are only needed for writes; importing them lazily
+    # keeps read-only one-shot commands quick to start.
+    import tempfile
+
+    path = Path(filepath)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
-    except json.JSONDecodeError:
-        return []
+        # mkstemp creates the file as 0600; keep the mode the target has, or
+        # would get from open(), so other users can still read the data.
+        if hasattr(os, "fchmod"):  # not available on Windows
+            try:
+                mode = os.stat(path).st_mode & 0o777
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+            os.fchmod(fd, mode)
+        with open(fd, "w", encoding="utf-8") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    _fsync_dir(path.parent)
+
+
+class _HeldLock:
+    """A lock file held by this process and how many users it has."""
+
+    __slots__ = ("file", "count", "locked", "exclusive", "mutex")
+
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+        self.locked = False
+        self.exclusive = False
+        # Serializes flock calls on this file only.
+        self.mutex = threading.Lock()
+
+
+_held_locks = {}
+_held_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(path, exclusive: bool = False):
+    """Hold an advisory fcntl lock, shared or exclusive, on a lock file.
+
+    Locks are reentrant within the process: a nested request reuses the
+    lock already held and only upgrades it when exclusive access is needed.
+    The bookkeeping is shared by all threads, but a thread waiting for a
+    contended lock only blocks others waiting for the same file.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    key = str(path)
+    with _held_locks_guard:
+        held = _held_locks.get(key)
+        if held is None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            held = _held_locks[key] = _HeldLock(open(path, "a"))
+        held.count += 1
+    try:
+        with held.mutex:
+            if not held.locked or (exclusive and not held.exclusive):
+                fcntl.flock(held.file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                held.locked = True
+                held.exclusive = held.exclusive or exclusive
+        yield
+    finally:
+        with _held_locks_guard:
+            held.count -= 1
+            if not held.count:
+                del _held_locks[key]
+                held.file.close()
+
+
+def table_lock(table_name: str, data_dir: str = "data", exclusive: bool = False):
+    """Lock a table against other processes (shared for reads)."""
+    return file_lock(Path(data_dir) / f"{table_name}{LOCK_SUFFIX}", exclusive)
+
+
+def metadata_lock(filepath: str, exclusive: bool = False):
+    """Lock the metadata file against other processes (shared for reads)."""
+    return file_lock(f"{filepath}{LOCK_SUFFIX}", exclusive)
+
+
+_MISSING = object()
+
+
+class TableData(list):
+    """Table records kept in ID order, plus the last issued ID."""
+
+    def __init__(self, records=(), sequence: int = 0):
+        super().__init__(records)
+        self.sequence = sequence
+
+    def positions(self):
+        """Iterate over the positions of all records."""
+        return iter(range(len(self)))
+
+    def position_of(self, record_id: int) -> Optional[int]:
+        """Find the position of a record by ID with a bisect over ID order."""
+        position = bisect_left(self, record_id, key=_record_id)
+        if position < len(self) and self[position]["ID"] == record_id:
+            return position
+        return None
+
+    def column(self, name: str):
+        """Iterate over the values of one column in row order."""
+        return (record.get(name, _MISSING) for record in self)
+
+    def delete_positions(self, positions) -> None:
+        """Delete records at the given positions."""
+        dropped = set(positions)
+        self[:] = [
+            record for position, record in enumerate(self)
+            if position not in dropped
+        ]
+
+
+class JsonStorage:
+    """Base JSON file plus the append-only log replayed on load.
+
+    The base file is {"sequence": <last ID>, "records": [...]}; a bare list
+    of records from older versions is accepted as well.
+    """
+
+    suffixes = (".json",)
+
+    def load(self, table_name: str, data_dir: str) -> TableData:
+        """Load the base file and replay the table log over it."""
+        raw = _read_json(Path(data_dir) / f"{table_name}.json", [])
+        if isinstance(raw, dict):
+            data = TableData(raw["records"], raw["sequence"])
+        else:
+            data = TableData(raw, max((record["ID"] for record in raw), default=0))
+
+        return _replay_log(data, _log_path(table_name, data_dir))
+
+    def save(self, table_name: str, data, data_dir: str, columns: dict) -> None:
+        """Write the full table state to the base file."""
+        filepath = Path(data_dir) / f"{table_name}.json"
+        with atomic_write(filepath) as f:
+            records = data if isinstance(data, list) else [dict(r) for r in data]
+            json.dump(
+                {"sequence": data.sequence, "records": records},
+                f,
+                indent=4,
+                ensure_ascii=False,
+            )
+
+    def sync(self, data, entries: list) -> None:
+        """Nothing to do: JSON tables only change through the log."""
+
+    def size(self, table_name: str, data_dir: str) -> int:
+        """Return the size of the base file in bytes."""
+        return _file_size(Path(data_dir) / f"{table_name}.json")
+
+    def remove(self, table_name: str, data_dir: str) -> None:
+        (Path(data_dir) / f"{table_name}.json").unlink(missing_ok=True)
+
+
+class BinaryStorage:
+    """Memory-mapped fixed-width records, see binary.py.
+
+    Changes are written in place, so the table log only serves as a journal
+    for catching up index snapshots and is never replayed into the data.
+    """
+
+    suffixes = (BINARY_SUFFIX, HEAP_SUFFIX)
+
+    def load(self, table_name: str, data_dir: str) -> BinaryTable:
+        """Map the table files."""
+        return BinaryTable(*self._paths(table_name, data_dir))
+
+    def save(self, table_name: str, data, data_dir: str, columns: dict) -> None:
+        """Flush an open table or write the records into new table files.
+
+        New files are built under temporary names and renamed into place,
+        the heap first, so a crash never leaves a .bin without its strings.
+        """
+        path, heap_path = self._paths(table_name, data_dir)
+        if isinstance(data, BinaryTable) and data.path == path:
+            data.flush()
+            return
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_heap_path = heap_path.with_name(f".{heap_path.name}.tmp")
+        table = BinaryTable.create(
+            tmp_path, tmp_heap_path, columns, (dict(r) for r in data), data.sequence
+        )
+        table.close()
+        os.replace(tmp_heap_path, heap_path)
+        os.replace(tmp_path, path)
+        _fsync_dir(path.parent)
+
+    def sync(self, data, entries: list) -> None:
+        """Flush in-place changes to disk."""
+        data.flush()
+
+    def size(self, table_name: str, data_dir: str) -> int:
+        """Return the size of the record file in bytes."""
+        return _file_size(self._paths(table_name, data_dir)[0])
+
+    def remove(self, table_name: str, data_dir: str) -> None:
+        for path in self._paths(table_name, data_dir):
+            path.unlink(missing_ok=True)
+
+    def _paths(self, table_name: str, data_dir: str) -> tuple:
+        base = Path(data_dir)
+        return (
+            base / f"{table_name}{BINARY_SUFFIX}",
+            base / f"{table_name}{HEAP_SUFFIX}",
+        )
+
+
+class SegmentedStorage:
+    """Segment files by ID range plus the append-only log, see segments.py.
+
+    The manifest is {"sequence": <last ID>, "rows": <segment size>,
+    "segments": {"<number>": [<records>, <bytes>], ...}}. Logged mutations
+    are replayed into their segments on load; saving rewrites only the
+    segments changed since the last save, so compacting the log of a large
+    table costs in proportion to the changed segments, not the table.
+    """
+
+    suffixes = (SEGMENTS_SUFFIX,)
+
+    def load(self, table_name: str, data_dir: str) -> SegmentedTable:
+        """Read the manifest and the log; segments are read when needed."""
+        manifest_path, directory = self._paths(table_name, data_dir)
+        manifest = _read_json(manifest_path, None) or {}
+        rows = manifest.get("rows", SEGMENT_ROWS)
+        counts = {
+            int(number): count
+            for number, (count, _) in manifest.get("segments", {}).items()
+        }
+
+        pending = {}
+        for entry in _read_log(_log_path(table_name, data_dir)):
+            record_id = _entry_id(entry)
+            pending.setdefault(segment_of(record_id, rows), []).append(entry)
+
+        def load_segment(number: int) -> list:
+            with metrics.phase("load"):
+                return _read_json(directory / f"{number}.json", [])
+
+        table = SegmentedTable(
+            rows,
+            load_segment,
+            counts,
+            manifest.get("sequence", 0),
+            pending,
+        )
+        table.path = directory
+        return table
+
+    def save(self, table_name: str, data, data_dir: str, columns: dict) -> None:
+        """Write the changed segments of an open table, or all records.
+
+        Segment files are replaced one by one and the manifest last; files
+        of segments left empty are removed after it.
+        """
+        manifest_path, directory = self._paths(table_name, data_dir)
+        manifest = _read_json(manifest_path, None) or {}
+        if isinstance(data, SegmentedTable) and data.path == directory:
+            rows = data.rows
+            sizes = {
+                int(number): size
+                for number, (_, size) in manifest.get("segments", {}).items()
+            }
+            changed = {number: data.segment(number) for number in data.dirty}
+            counts = data.counts()
+        else:
+            rows = manifest.get("rows", SEGMENT_ROWS)
+            sizes = {}
+            changed = {}
+            for record in data:
+                number = segment_of(record["ID"], rows)
+                changed.setdefault(number, []).append(dict(record))
+            counts = {number: len(records) for number, records in changed.items()}
+            if directory.exists():
+                for path in directory.glob("*.json"):
+                    if path.stem.isdigit() and int(path.stem) not in changed:
+                        changed[int(path.stem)] = []
+
+        for number, records in changed.items():
+            if records:
+                with atomic_write(directory / f"{number}.json") as f:
+                    json.dump(records, f, ensure_ascii=False)
+                sizes[number] = _file_size(directory / f"{number}.json")
+
+        with atomic_write(manifest_path) as f:
+            json.dump(
+                {
+                    "sequence": data.sequence,
+                    "rows": rows,
+                    "segments": {
+                        str(number): [count, sizes.get(number, 0)]
+                        for number, count in sorted(counts.items())
+                        if count
+                    },
+                },
+                f,
+            )
+
+        for number, records in changed.items():
+            if not records:
+                (directory / f"{number}.json").unlink(missing_ok=True)
+        if isinstance(data, SegmentedTable):
+            data.dirty.clear()
+
+    def sync(self, data, entries: list) -> None:
+        """Note the segments of logged changes for the next save."""
+        for entry in entries:
+            if entry["op"] == "update":
+                data.mark_changed(entry["id"])
+
+    def size(self, table_name: str, data_dir: str) -> int:
+        """Return the total size of the segment files from the manifest."""
+        manifest = _read_json(self._paths(table_name, data_dir)[0], None) or {}
+        return sum(size for _, size in manifest.get("segments", {}).values())
+
+    def remove(self, table_name: str, data_dir: str) -> None:
+        import shutil
+
+        manifest_path, directory = self._paths(table_name, data_dir)
+        manifest_path.unlink(missing_ok=True)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def _paths(self, table_name: str, data_dir: str) -> tuple:
+        base = Path(data_dir)
+        return (
+            base / f"{table_name}{SEGMENTS_SUFFIX}",
+            base / f"{table_name}.segments",
+        )
+
+
+STORAGES = {
+    "segments": SegmentedStorage(),
+    "json": JsonStorage(),
+    "binary": BinaryStorage(),
+}
+
+
+def table_storage(table_name: str, data_dir: str = "data") -> str:
+    """Return the name of the storage backend a table uses."""
+    for name, storage in STORAGES.items():
+        if (Path(data_dir) / f"{table_name}{storage.suffixes[0]}").exists():
+            return name
+    return DEFAULT_STORAGE
+
+
+def table_files(table_name: str, data_dir: str = "data") -> list:
+    """Return every file a table may use, in a stable order."""
+    suffixes = [suffix for s in STORAGES.values() for suffix in s.suffixes]
+    suffixes += [LOG_SUFFIX, INDEX_SUFFIX]
+    return [Path(data_dir) / f"{table_name}{suffix}" for suffix in suffixes]
+
+
+def load_table_data(table_name: str, data_dir: str = "data"):
+    """Load table data with the storage backend of the table."""
+    with table_lock(table_name, data_dir):
+        storage = STORAGES[table_storage(table_name, data_dir)]
+        return storage.load(table_name, data_dir)
 
 
 def save_table_data(
     table_name: str,
-    data: list,
-    data_dir: str = "data"
+    data,
+    data_dir: str = "data",
+    storage: Optional[str] = None,
+    columns: Optional[dict] = None,
+    indexes: Optional[dict] = None,
 ) -> None:
-    """Save table data to JSON file."""
+    """Save the full table state.
+
+    The table files then hold everything, so the table log is dropped and
+    the index snapshot is brought up to date: `indexes` kept in memory for
+    `data` are saved as they are. Without them an open segmented table
+    catches the snapshot up with the log, so that compaction reads only
+    changed segments; other tables rebuild it from `data`. Passing a
+    `storage` other than the current one converts the table; `columns`
+    (the schema) is needed when converting to binary.
+    """
     Path(data_dir).mkdir(parents=True, exist_ok=True)
-    filepath = Path(data_dir) / f"{table_name}.json"
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    with table_lock(table_name, data_dir, exclusive=True):
+        current = table_storage(table_name, data_dir)
+        target = storage or current
+        index_path = _index_path(table_name, data_dir)
+        if not index_path.exists():
+            indexes = None
+        elif indexes is None and target == current and isinstance(
+            data, SegmentedTable
+        ):
+            # Read before the log it catches up with is dropped.
+            indexes = load_indexes(table_name, data_dir)
+
+        STORAGES[target].save(table_name, data, data_dir, columns)
+        if target != current:
+            STORAGES[current].remove(table_name, data_dir)
+        _log_path(table_name, data_dir).unlink(missing_ok=True)
+
+        if index_path.exists():
+            if indexes is None:
+                kinds = index.kinds_of_json(_read_index_file(index_path))
+                indexes = {
+                    column: index.build_index(data, column, kind)
+                    for column, kind in kinds.items()
+                }
+            save_indexes(table_name, indexes, data_dir)
+
+
+def append_table_log(
+    table_name: str,
+    entries: list,
+    data,
+    data_dir: str = "data",
+    indexes: Optional[dict] = None,
+) -> None:
+    """Append mutation entries to the table log.
+
+    Entries are dicts of the form {"op": "insert", "record": {...}},
+    {"op": "update", "id": 1, "values": {...}} or {"op": "delete", "id": 1}.
+    `data` is the table state after the mutations; it is written to the
+    base file instead once the log grows past the compaction threshold,
+    together with its in-memory `indexes` if given (see save_table_data).
+    """
+    if not entries:
+        return
+
+    Path(data_dir).mkdir(parents=True, exist_ok=True)
+    with table_lock(table_name, data_dir, exclusive=True):
+        storage = table_storage(table_name, data_dir)
+        STORAGES[storage].sync(data, entries)
+
+        log_path = _log_path(table_name, data_dir)
+        _trim_torn_tail(log_path)
+        with open(log_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False))
+                f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        if _needs_compaction(table_name, data_dir, STORAGES[storage]):
+            save_table_data(table_name, data, data_dir, indexes=indexes)
+
+
+def iter_file_records(filepath: str, columns: dict):
+    """Stream records from a .csv (with a header row) or .jsonl file.
+
+    CSV fields are converted to the column types from `columns`; values that
+    do not convert are passed on as strings for validation to reject. CSV
+    rows with too few or too many fields raise ValueError.
+    """
+    suffix = Path(filepath).suffix.lower()
+    if suffix == ".csv":
+        with open(filepath, "r", encoding="utf-8", newline="") as f:
+            for number, row in enumerate(csv.DictReader(f), start=1):
+                # DictReader fills missing fields with None and puts extra
+                # ones under the None key.
+                if None in row:
+                    raise ValueError(f"запись {number}: лишние поля в строке.")
+                if None in row.values():
+                    raise ValueError(f"запись {number}: не хватает полей в строке.")
+                yield {
+                    column: _convert_csv_value(value, columns.get(column))
+                    for column, value in row.items()
+                }
+    elif suffix == ".jsonl":
+        with open(filepath, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        raise ValueError(f'Неподдерживаемый формат файла "{suffix}".')
+
+
+def delete_table_files(table_name: str, data_dir: str = "data") -> None:
+    """Remove the data files, the log and the indexes of a table."""
+    with table_lock(table_name, data_dir, exclusive=True):
+        for storage in STORAGES.values():
+            storage.remove(table_name, data_dir)
+        for path in table_files(table_name, data_dir):
+            path.unlink(missing_ok=True)
+
+
+def load_indexes(table_name: str, data_dir: str = "data") -> dict:
+    """Load the index snapshot of a table and catch it up with the log.
+
+    Logged inserts and updates are added to the indexes; stale entries left
+    by updates and deletes are harmless because index hits are re-checked.
+    """
+    with table_lock(table_name, data_dir):
+        index_path = _index_path(table_name, data_dir)
+        if not index_path.exists():
+            return {}
+
+        indexes = index.from_json(_read_index_file(index_path))
+        for entry in _read_log(_log_path(table_name, data_dir)):
+            if entry["op"] == "insert":
+                index.add_record(indexes, entry["record"])
+            elif entry["op"] == "update":
+                index.add_record(indexes, {"ID": entry["id"], **entry["values"]})
+
+    return indexes
+
+
+def save_indexes(table_name: str, indexes: dict, data_dir: str = "data") -> None:
+    """Save the index snapshot of a table."""
+    with table_lock(table_name, data_dir, exclusive=True):
+        with atomic_write(_index_path(table_name, data_dir)) as f:
+            json.dump(index.to_json(indexes), f, ensure_ascii=False)
+
+
+def _convert_csv_value(value: str, column_type: str):
+    """Convert a CSV field to a column type when it is well-formed."""
+    if column_type == "int":
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    if column_type == "bool" and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    return value
+
+
+def _record_id(record) -> int:
+    """Return the ID of a record, the sort key of table data."""
+    return record["ID"]
+
+
+def _entry_id(entry: dict) -> int:
+    """Return the ID of the record a log entry changes."""
+    if entry["op"] == "insert":
+        return entry["record"]["ID"]
+    return entry["id"]
+
+
+def _log_path(table_name: str, data_dir: str) -> Path:
+    """Return the path of the table log."""
+    return Path(data_dir) / f"{table_name}{LOG_SUFFIX}"
+
+
+def _index_path(table_name: str, data_dir: str) -> Path:
+    """Return the path of the table index snapshot."""
+    return Path(data_dir) / f"{table_name}{INDEX_SUFFIX}"
+
+
+def _read_index_file(index_path: Path) -> dict:
+    """Read a raw index snapshot."""
+    return _read_json(index_path, {})
+
+
+def _read_json(path: Path, default):
+    """Read a JSON file, returning `default` if it does not exist.
+
+    A file that does not parse is reported instead of being read as empty,
+    which would lose the data on the next save.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except json.JSONDecodeError as e:
+        raise ValueError(f'Файл "{path}" поврежден: {e}.') from e
+
+
+def _fsync_dir(directory: Path) -> None:
+    """Persist a rename in `directory`, where the platform supports it."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _needs_compaction(table_name: str, data_dir: str, storage) -> bool:
+    """Check whether the log outgrew the compaction threshold."""
+    log_size = _log_path(table_name, data_dir).stat().st_size
+    return log_size > max(LOG_COMPACT_MIN_BYTES, storage.size(table_name, data_dir))
+
+
+def _file_size(path: Path) -> int:
+    """Return the size of a file, 0 if it does not exist."""
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _replay_log(data: TableData, log_path: Path) -> TableData:
+    """Apply logged mutations on top of the base records."""
+    if not log_path.exists():
+        return data
+
+    records = {record["ID"]: record for record in data}
+    for entry in _read_log(log_path):
+        op = entry["op"]
+        if op == "insert":
+            record = entry["record"]
+            records[record["ID"]] = record
+            data.sequence = max(data.sequence, record["ID"])
+        elif op == "update":
+            record = records.get(entry["id"])
+            if record is not None:
+                record.update(entry["values"])
+        elif op == "delete":
+            records.pop(entry["id"], None)
+
+    return TableData(records.values(), data.sequence)
+
+
+def _read_log(log_path: Path):
+    """Yield the entries of a table log.
+
+    A last line without a newline is what an interrupted append leaves
+    behind; it was never committed and is skipped. Any other line that
+    does not parse means the log is damaged.
+    """
+    try:
+        f = open(log_path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return
+
+    with f:
+        for number, line in enumerate(f, start=1):
+            if not line.endswith("\n"):
+                return
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(
+                    f'Журнал "{log_path}" поврежден в строке {number}: {e}.'
+                ) from e
+
+
+def _trim_torn_tail(log_path: Path) -> None:
+    """Cut off an incomplete last line so that new entries start cleanly."""
+    try:
+        f = open(log_path, "r+b")
+    except FileNotFoundError:
+        return
+
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        if not size:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        f.seek(0)
+        f.truncate(f.read().rfind(b"\n") + 1)